@@ -0,0 +1,238 @@
+"""
+In-process latency histograms and gauges exported in Prometheus text format.
+
+Every timed section records its wall time split into database time and
+Python time. Database time is measured by an execute wrapper installed on
+each connection and charged to the innermost active timer through a
+context variable, which asgiref copies into ``database_sync_to_async``
+threads, so consumer stages see the queries they caused.
+
+Views decorated with ``query_budget`` also record how many queries each
+request ran, and log a warning when they exceed the budget. The budgets
+themselves are enforced by each app's tests.
+
+Metrics live in the worker process; each worker serves its own /metrics,
+which needs ``METRICS_TOKEN`` as a bearer token unless ``DEBUG`` is on.
+"""
+import bisect
+import contextvars
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+logger = logging.getLogger(__name__)
+_registry = []
+_db_time = contextvars.ContextVar('metrics_db_time', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(series):
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, hits in zip(self.buckets, counts):
+                cumulative += hits
+                lines.append(f'{self.name}_bucket{_labels(pairs + [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(pairs + [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_labels(pairs)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(pairs)} {count}')
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from ``func`` at scrape time."""
+
+    def __init__(self, name, documentation, func):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        _registry.append(self)
+
+    def collect(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} gauge',
+            f'{self.name} {_number(self.func())}',
+        ]
+
+
+class Timing:
+    """A histogram family split into total, db and python components."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.histogram = Histogram(name, documentation, (*labelnames, 'component'), buckets)
+
+    @contextmanager
+    def time(self, **labels):
+        parent = _db_time.get()
+        spent = [0.0]
+        token = _db_time.set(spent)
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            total = time.perf_counter() - start
+            _db_time.reset(token)
+            if parent is not None:
+                parent[0] += spent[0]
+            db = min(spent[0], total)
+            self.histogram.observe(total, component='total', **labels)
+            self.histogram.observe(db, component='db', **labels)
+            self.histogram.observe(total - db, component='python', **labels)
+
+
+def _charge_db_time(execute, sql, params, many, context):
+    spent = _db_time.get()
+    if spent is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        spent[0] += time.perf_counter() - start
+
+
+def _install_db_timer(sender, connection, **kwargs):
+    # connection_created fires again each time a connection is reopened.
+    if _charge_db_time not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_charge_db_time)
+
+
+connection_created.connect(_install_db_timer)
+
+
+http_requests = Timing(
+    'chessclub_http_request_seconds',
+    'Time spent serving HTTP requests, by view.',
+    ('view', 'method'),
+)
+ws_stages = Timing(
+    'chessclub_ws_stage_seconds',
+    'Time spent in MatchConsumer stages.',
+    ('stage',),
+)
+
+view_queries = Histogram(
+    'chessclub_view_queries',
+    'Database queries per request of views with a query budget.',
+    ('view',),
+    QUERY_COUNT_BUCKETS,
+)
+
+
+def query_budget(limit):
+    """
+    Decorate a view that must not run more than ``limit`` queries.
+
+    Going over is only logged, never fails the request; the app's tests
+    hold each view to its budget with ``assertNumQueries``.
+    """
+    def decorator(view):
+        name = view.__name__
+
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            count = [0]
+
+            def counter(execute, sql, params, many, context):
+                count[0] += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            view_queries.observe(count[0], view=name)
+            if count[0] > limit:
+                logger.warning('%s ran %s queries, over its budget of %s', name, count[0], limit)
+            return response
+
+        wrapped.query_budget = limit
+        return wrapped
+
+    return decorator
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with http_requests.time(view='unresolved', method=request.method) as labels:
+            response = self.get_response(request)
+            match = request.resolver_match
+            if match is not None:
+                labels['view'] = match.view_name
+        return response
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    # Served to anyone only in development; otherwise METRICS_TOKEN is required.
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
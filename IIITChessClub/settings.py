@@ -26,6 +26,9 @@ if env_path.exists():
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get("DJANGO_KEY")
+
+# Bearer token required by /metrics when set.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
@@ -53,6 +56,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.User'
 
 MIDDLEWARE = [
+    'IIITChessClub.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
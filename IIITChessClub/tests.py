@@ -0,0 +1,24 @@
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .metrics import metrics_view
+
+
+class MetricsAccessTests(SimpleTestCase):
+    def get(self, **headers):
+        return metrics_view(RequestFactory().get('/metrics', headers=headers))
+
+    @override_settings(DEBUG=False, METRICS_TOKEN=None)
+    def test_hidden_without_token(self):
+        with self.assertRaises(Http404):
+            self.get()
+
+    @override_settings(DEBUG=True, METRICS_TOKEN=None)
+    def test_open_in_development(self):
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='secret')
+    def test_token_required(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get(Authorization='Bearer wrong').status_code, 403)
+        self.assertEqual(self.get(Authorization='Bearer secret').status_code, 200)
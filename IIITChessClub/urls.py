@@ -18,6 +18,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 from .views import home, login, match
 
 urlpatterns = [
@@ -28,6 +29,7 @@ urlpatterns = [
     path('tournaments/', include('tournaments.urls')),
     path('newsletters/', include('newsletters.urls')),
     path('login/', login, name='login'),
+    path('metrics', metrics_view, name='metrics'),
     # path('match/', match, name='match'),
     path("match/",include('match.urls')),
 ]
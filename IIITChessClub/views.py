@@ -3,6 +3,7 @@ from django.shortcuts import render, redirect
 from django.utils.timezone import now
 import json
 from accounts.models import User
+from leaderboard.ranks import rank_index, with_users
 from tournaments.models import Tournament
 from newsletters.models import Newsletter
 
@@ -25,7 +26,7 @@ def home(request):
         .order_by('-published_date')
         .first()
     )
-    top_users = User.objects.select_related("profile").order_by("-profile__rating")[:5]
+    top_users = with_users(rank_index.range(1, 5))
     return render(request, 'home.html', {"top_users": top_users, "next_tournament": next_tournament, "latest_newsletter": latest_newsletter})
 
 def login(request):
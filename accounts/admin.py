@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, UserProfile
+from .models import ClubStat, PlayerStats, RatingHistory, User, UserProfile
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -11,3 +11,21 @@ class UserAdmin(admin.ModelAdmin):
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'rating', 'rank',)
     search_fields = ('user', 'rank',)
+
+
+@admin.register(RatingHistory)
+class RatingHistoryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'match', 'rating_before', 'rating_after', 'created_at',)
+    search_fields = ('user__username',)
+
+
+
+@admin.register(ClubStat)
+class ClubStatAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value',)
+
+
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'streak_result', 'streak_length', 'form',)
+    search_fields = ('user__username',)
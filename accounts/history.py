@@ -0,0 +1,157 @@
+"""
+Per-player results and match history.
+
+PlayerStats holds each player's wins, draws and losses by colour, the
+current streak and the last few results, so a profile never has to scan
+a player's games. Rows are updated as games finish:
+
+* live games when ``accounts.ratings.rate_matches`` rates them, in the
+  same transaction that claims the match, so each is counted once;
+* tournament games when their result is entered, from
+  ``accounts.signals``. An entered result takes the place of the
+  pairing's live game, which is then not counted.
+
+A player without a row is rebuilt from their games, as are both players
+when a result is corrected or replaces a live game that was already
+counted. ``rebuild_player_stats`` rebuilds everyone, e.g. after games
+are deleted.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+
+from match.models import Match
+from match.paging import keyset_page
+from tournaments.models import TournamentMatch
+
+from .models import PlayerStats
+
+HISTORY_PAGE_SIZE = 10
+# Outcome for (white, black) of a finished live game.
+MATCH_OUTCOMES = {'1-0': ('W', 'L'), '0-1': ('L', 'W'), '1/2-1/2': ('D', 'D')}
+# Outcome for (player1, player2) of a tournament game; player1 has white.
+TOURNAMENT_OUTCOMES = {'PLAYER1': ('W', 'L'), 'PLAYER2': ('L', 'W'), 'DRAW': ('D', 'D')}
+STAT_FIELDS = [
+    'white_wins', 'white_draws', 'white_losses', 'black_wins', 'black_draws', 'black_losses',
+    'streak_result', 'streak_length', 'form',
+]
+
+
+def match_games(match):
+    """``(user_id, color, outcome)`` for both players of a finished live game."""
+    white, black = MATCH_OUTCOMES[match.result]
+    return [(match.player_white_id, 'white', white), (match.player_black_id, 'black', black)]
+
+
+def tournament_games(pairing):
+    first, second = TOURNAMENT_OUTCOMES[pairing.result]
+    return [(pairing.player1_id, 'white', first), (pairing.player2_id, 'black', second)]
+
+
+def counted_matches():
+    """Live games that are in PlayerStats: the ones rate_matches has claimed."""
+    return Match.objects.filter(
+        status='END',
+        rated=True,
+        result__in=MATCH_OUTCOMES,
+        player_white__isnull=False,
+        player_black__isnull=False,
+    ).exclude(player_white=F('player_black')).exclude(tournament_pairing__result__in=TOURNAMENT_OUTCOMES)
+
+
+def counted_pairings():
+    return TournamentMatch.objects.filter(result__in=TOURNAMENT_OUTCOMES)
+
+
+def record_matches(matches):
+    """Count newly rated live games, oldest first, unless a result was entered for them."""
+    entered = set(
+        counted_pairings()
+        .filter(live_match__in=[match.id for match in matches])
+        .values_list('live_match_id', flat=True)
+    )
+    record([game for match in matches if match.id not in entered for game in match_games(match)])
+
+
+def record_pairing(pairing, before):
+    """Count ``pairing``'s newly saved result; ``before`` is its previous result, None if unknown."""
+    live_game_counted = (
+        pairing.live_match_id is not None
+        and Match.objects.filter(id=pairing.live_match_id, status='END', rated=True).exists()
+    )
+    if before == 'PENDING' and not live_game_counted:
+        record(tournament_games(pairing))
+    else:
+        rebuild([pairing.player1_id, pairing.player2_id])
+
+
+def record(games):
+    """
+    Apply ``(user_id, color, outcome)`` games, oldest first, to PlayerStats.
+    The games must already be saved, in the caller's transaction if any.
+    """
+    user_ids = {user_id for user_id, _, _ in games}
+    if not user_ids:
+        return
+    with transaction.atomic():
+        stats = PlayerStats.objects.select_for_update().in_bulk(user_ids, field_name='user_id')
+        # A player without a row is rebuilt from every game, these included.
+        rebuild(user_ids - stats.keys())
+        changed = {}
+        for user_id, color, outcome in games:
+            if user_id in stats:
+                stats[user_id].record(color, outcome)
+                changed[user_id] = stats[user_id]
+        PlayerStats.objects.bulk_update(changed.values(), STAT_FIELDS)
+
+
+def rebuild(user_ids):
+    """Recompute the PlayerStats of ``user_ids`` from their games."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    stats = {user_id: PlayerStats(user_id=user_id) for user_id in user_ids}
+    games = []
+    matches = counted_matches().filter(
+        Q(player_white_id__in=user_ids) | Q(player_black_id__in=user_ids)
+    ).only('id', 'result', 'start_time', 'end_time', 'player_white_id', 'player_black_id')
+    for match in matches:
+        games.append((match.end_time or match.start_time, 0, match.id, match_games(match)))
+    pairings = counted_pairings().filter(
+        Q(player1_id__in=user_ids) | Q(player2_id__in=user_ids)
+    ).only('id', 'result', 'scheduled_at', 'completed_at', 'player1_id', 'player2_id')
+    for pairing in pairings:
+        games.append((pairing.completed_at or pairing.scheduled_at, 1, pairing.id, tournament_games(pairing)))
+    games.sort(key=lambda game: game[:3])
+    for _, _, _, players in games:
+        for user_id, color, outcome in players:
+            if user_id in stats:
+                stats[user_id].record(color, outcome)
+    PlayerStats.objects.bulk_create(
+        stats.values(),
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=STAT_FIELDS,
+    )
+
+
+def player_stats(user):
+    stats = PlayerStats.objects.filter(user=user).first()
+    if stats is None:
+        rebuild([user.id])
+        stats = PlayerStats.objects.get(user=user)
+    return stats
+
+
+def history_page(user, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of ``user``'s tournament games, newest first, with the
+    tournament and both players joined in. Returns ``(pairings,
+    next_cursor)``; ValueError for a malformed cursor.
+    """
+    pairings = (
+        TournamentMatch.objects
+        .filter(Q(player1=user) | Q(player2=user))
+        .select_related('tournament', 'player1', 'player2')
+        .annotate(fen=F('live_match__current_fen'))
+    )
+    return keyset_page(pairings, 'scheduled_at', cursor, limit)
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from accounts.models import UserProfile
+from match.loadtest import QueryCounter
+
+User = get_user_model()
+
+
+def legacy_save(profile):
+    """What UserProfile.save did before it tracked the loaded rating."""
+    with transaction.atomic():
+        old = UserProfile.objects.get(pk=profile.pk)
+        if old.rating != profile.rating:
+            profile.last_rating = old.rating
+        models.Model.save(profile)
+
+
+class Command(BaseCommand):
+    help = "Benchmark rating updates: re-read save vs tracked save vs bulk_update_ratings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        count, batch_size = options['profiles'], options['batch_size']
+        rng = random.Random(options['seed'])
+        paths = (
+            ('legacy', lambda profiles: [legacy_save(p) for p in profiles]),
+            ('save', lambda profiles: [p.save() for p in profiles]),
+            ('bulk', lambda profiles: UserProfile.objects.bulk_update_ratings(profiles, batch_size=batch_size)),
+        )
+
+        results = []
+        # Everything happens in one transaction that is rolled back, so the
+        # bench players never reach the leaderboard or the rank index.
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=f'bench_rating_{i}') for i in range(count)
+            )
+            if users[0].pk is None:
+                users = User.objects.filter(username__startswith='bench_rating_')
+            UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+            user_ids = [user.pk for user in users]
+
+            for label, update in paths:
+                profiles = list(UserProfile.objects.filter(user_id__in=user_ids))
+                for profile in profiles:
+                    profile.rating += rng.randint(-30, 30) or 1
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    start = time.perf_counter()
+                    update(profiles)
+                    elapsed = time.perf_counter() - start
+                results.append((label, counter.count, elapsed))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{count} profiles, bulk batches of {batch_size}")
+        self.stdout.write(f"{'path':<8} {'queries':>8} {'seconds':>9} {'rows/sec':>10}")
+        for label, queries, elapsed in results:
+            self.stdout.write(f"{label:<8} {queries:>8} {elapsed:>9.3f} {count / elapsed:>10.0f}")
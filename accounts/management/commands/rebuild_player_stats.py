@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.history import rebuild
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute every player's results, streak and form from their games"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        size = options['batch_size']
+        for start in range(0, len(user_ids), size):
+            with transaction.atomic():
+                rebuild(user_ids[start:start + size])
+        self.stdout.write(f"Rebuilt stats for {len(user_ids)} players")
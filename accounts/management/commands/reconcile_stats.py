@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from accounts.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the club statistics shown on the profile page and fix any drift; run periodically"
+
+    def handle(self, *args, **options):
+        drifted = reconcile()
+        for name, (stored, actual) in sorted(drifted.items()):
+            self.stdout.write(f"{name}: {stored} -> {actual}")
+        self.stdout.write(f"Reconciled club stats ({len(drifted)} counters drifted)")
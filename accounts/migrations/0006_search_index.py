@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'accounts_user_search'
+
+
+def create_fts_table(apps, schema_editor):
+    # Trigram FTS5 needs SQLite 3.34+ built with FTS5; without it, search
+    # falls back to SearchTerm prefixes.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(name, tokenize='trigram')")
+    except OperationalError:
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def fill_search_index(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    SearchTerm = apps.get_model('accounts', 'SearchTerm')
+    connection = schema_editor.connection
+    has_fts = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    terms, rows = [], []
+    for user_id, username, first_name, last_name in User.objects.values_list('id', 'username', 'first_name', 'last_name').iterator():
+        text = f"{username} {first_name} {last_name}".strip()
+        found = set(text.lower().split())
+        full_name = " ".join(f"{first_name} {last_name}".lower().split())
+        if " " in full_name:
+            found.add(full_name)
+        terms.extend(SearchTerm(user_id=user_id, term=term[:150]) for term in found)
+        rows.append((user_id, text))
+    SearchTerm.objects.bulk_create(terms, batch_size=1000)
+    if has_fts and rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, name) VALUES (%s, %s)", rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_ratinghistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=150)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-rating', 'user'], name='profile_rating_user_idx'),
+        ),
+        migrations.AddField(
+            model_name='searchterm',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'user'], name='search_term_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
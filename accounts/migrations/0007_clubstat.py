@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:14
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def count_stats(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    Match = apps.get_model('match', 'Match')
+    TournamentMatch = apps.get_model('tournaments', 'TournamentMatch')
+    ClubStat = apps.get_model('accounts', 'ClubStat')
+    profiles = UserProfile.objects.aggregate(count=Count('pk'), total=Sum('rating'))
+    ClubStat.objects.bulk_create([
+        ClubStat(name='users', value=User.objects.count()),
+        ClubStat(name='profiles', value=profiles['count']),
+        ClubStat(name='rating_total', value=profiles['total'] or 0),
+        ClubStat(name='matches', value=Match.objects.count()),
+        ClubStat(name='tournament_matches', value=TournamentMatch.objects.count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_search_index'),
+        ('match', '0010_match_rated'),
+        ('tournaments', '0007_remove_tournamentmatch_fen_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClubStat',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_stats, migrations.RunPython.noop),
+    ]
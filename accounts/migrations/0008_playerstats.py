@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_clubstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('white_wins', models.PositiveIntegerField(default=0)),
+                ('white_draws', models.PositiveIntegerField(default=0)),
+                ('white_losses', models.PositiveIntegerField(default=0)),
+                ('black_wins', models.PositiveIntegerField(default=0)),
+                ('black_draws', models.PositiveIntegerField(default=0)),
+                ('black_losses', models.PositiveIntegerField(default=0)),
+                ('streak_result', models.CharField(blank=True, max_length=1)),
+                ('streak_length', models.PositiveIntegerField(default=0)),
+                ('form', models.CharField(blank=True, max_length=10)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='player_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'player stats',
+            },
+        ),
+    ]
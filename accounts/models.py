@@ -1,6 +1,5 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db import transaction
 from django.db.models import Q
 
 class User(AbstractUser):
@@ -44,6 +43,36 @@ class User(AbstractUser):
         return TournamentMatch.objects.filter(Q(player1=self) | Q(player2=self)).select_related("tournament")
 
 
+class UserProfileQuerySet(models.QuerySet):
+    def bulk_update_ratings(self, profiles, batch_size=None):
+        """
+        ``bulk_update`` the rating of ``profiles`` with ``save()``'s
+        ``last_rating`` semantics: a profile whose rating moved since it was
+        loaded gets its loaded rating as ``last_rating``. Unchanged profiles
+        are skipped. Returns the number of profiles written.
+        """
+        from .ratings import ratings_changed
+
+        changed = []
+        for profile in profiles:
+            loaded = profile._loaded_rating
+            if loaded is None:
+                raise ValueError("bulk_update_ratings needs profiles loaded from the database")
+            if profile.rating != loaded:
+                profile.last_rating = loaded
+                changed.append(profile)
+        self.bulk_update(changed, ["rating", "last_rating"], batch_size=batch_size)
+        for profile in changed:
+            profile._loaded_rating = profile.rating
+        if changed:
+            ratings_changed.send(
+                sender=UserProfile,
+                ratings={p.user_id: p.rating for p in changed},
+                previous={p.user_id: p.last_rating for p in changed},
+            )
+        return len(changed)
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     rating = models.IntegerField(default=600)
@@ -52,6 +81,23 @@ class UserProfile(models.Model):
     last_rank = models.IntegerField(default=0)
     chessdotcom = models.CharField(max_length=64, blank=True, null=True)
     lichess = models.CharField(max_length=64, blank=True, null=True)
+
+    objects = UserProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The profile directory pages by (rating desc, user).
+            models.Index(fields=["-rating", "user"], name="profile_rating_user_idx"),
+        ]
+
+    # Rating as last read from or written to the database; None if unknown.
+    _loaded_rating = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = instance.__dict__.get("rating")
+        return instance
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -69,15 +115,23 @@ class UserProfile(models.Model):
         }
     
     def save(self, *args, **kwargs):
-        with transaction.atomic():
-            if self.pk:
-                old = UserProfile.objects.get(pk=self.pk)
-                if old.rating != self.rating:
-                    self.last_rating = old.rating
-            else:
-                self.last_rating = self.rating
-
-            super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        writes_rating = update_fields is None or "rating" in update_fields
+        if self.pk is None:
+            self.last_rating = self.rating
+        elif writes_rating:
+            loaded = self._loaded_rating
+            if loaded is None:
+                # Built by hand rather than fetched; read what is stored.
+                loaded = UserProfile.objects.filter(pk=self.pk).values_list("rating", flat=True).first()
+                self._loaded_rating = loaded
+            if loaded is not None and loaded != self.rating:
+                self.last_rating = loaded
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "last_rating"}
+        super().save(*args, **kwargs)
+        if writes_rating:
+            self._loaded_rating = self.rating
     
     @property
     def rating_change(self):
@@ -93,4 +147,125 @@ class UserProfile(models.Model):
 
     @property
     def moved_down_in_rank(self, current_rank):
-        return current_rank > self.last_rank
\ No newline at end of file
+        return current_rank > self.last_rank
+
+
+class RatingHistory(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="rating_history")
+    match = models.ForeignKey("match.Match", on_delete=models.SET_NULL, null=True, blank=True, related_name="rating_changes")
+    rating_before = models.IntegerField()
+    rating_after = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="rating_history_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.rating_before} -> {self.rating_after}"
+
+    @property
+    def change(self):
+        return self.rating_after - self.rating_before
+
+    def to_dict(self):
+        return {
+            "match_id": self.match_id,
+            "rating_before": self.rating_before,
+            "rating_after": self.rating_after,
+            "change": self.change,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class SearchTerm(models.Model):
+    """One lowercased word of a user's username or name, searched by prefix."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="search_terms")
+    term = models.CharField(max_length=150)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["term", "user"], name="search_term_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.user_id}"
+
+
+class ClubStat(models.Model):
+    """One club-wide counter, kept current by ``accounts.stats``."""
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class PlayerStats(models.Model):
+    """A player's results by colour, current streak and recent form; see ``accounts.history``."""
+    FORM_LENGTH = 10
+    OUTCOMES = {"W": "wins", "D": "draws", "L": "losses"}
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="player_stats")
+    white_wins = models.PositiveIntegerField(default=0)
+    white_draws = models.PositiveIntegerField(default=0)
+    white_losses = models.PositiveIntegerField(default=0)
+    black_wins = models.PositiveIntegerField(default=0)
+    black_draws = models.PositiveIntegerField(default=0)
+    black_losses = models.PositiveIntegerField(default=0)
+    # "W", "D" or "L" and how many games in a row; empty before the first game.
+    streak_result = models.CharField(max_length=1, blank=True)
+    streak_length = models.PositiveIntegerField(default=0)
+    # The last FORM_LENGTH results, newest first, e.g. "WWDLW".
+    form = models.CharField(max_length=FORM_LENGTH, blank=True)
+
+    class Meta:
+        verbose_name_plural = "player stats"
+
+    def __str__(self):
+        return f"{self.user.username}: +{self.wins} ={self.draws} -{self.losses}"
+
+    def record(self, color, outcome):
+        """Count one game played as ``color`` ("white"/"black") ending in ``outcome`` ("W"/"D"/"L")."""
+        field = f"{color}_{self.OUTCOMES[outcome]}"
+        setattr(self, field, getattr(self, field) + 1)
+        if outcome == self.streak_result:
+            self.streak_length += 1
+        else:
+            self.streak_result, self.streak_length = outcome, 1
+        self.form = (outcome + self.form)[:self.FORM_LENGTH]
+
+    @property
+    def wins(self):
+        return self.white_wins + self.black_wins
+
+    @property
+    def draws(self):
+        return self.white_draws + self.black_draws
+
+    @property
+    def losses(self):
+        return self.white_losses + self.black_losses
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def win_rate(self):
+        return round(100 * self.wins / self.games) if self.games else 0
+
+    @property
+    def streak(self):
+        return f"{self.streak_result}{self.streak_length}" if self.streak_length else ""
+
+    def to_dict(self):
+        return {
+            "white": {"wins": self.white_wins, "draws": self.white_draws, "losses": self.white_losses},
+            "black": {"wins": self.black_wins, "draws": self.black_draws, "losses": self.black_losses},
+            "games": self.games,
+            "streak": self.streak,
+            "form": self.form,
+        }
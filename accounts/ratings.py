@@ -0,0 +1,140 @@
+"""
+Elo rating updates for finished matches.
+
+When a match ends, ``match_ended`` queues its id here once the result
+commits. A background thread drains the queue in batches and rates the
+batch in one transaction: matches are claimed by flipping ``Match.rated``,
+rated in the order they ended (so a player with two games in a batch is
+rated sequentially), and the profiles are written with one
+``bulk_update_ratings`` plus one ``bulk_create`` of RatingHistory rows.
+The same transaction counts the games into PlayerStats. Nothing runs on
+the consumer that broadcast the result.
+
+A match is only rated once, however often it is queued. Anything lost
+with a worker process (the queue is in memory) is picked up by the
+``rate_matches`` command.
+"""
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+from match.models import Match
+
+from .history import record_matches
+from .models import RatingHistory, UserProfile
+
+K_FACTOR = getattr(settings, 'RATING_K_FACTOR', 32)
+BATCH_SIZE = getattr(settings, 'RATING_BATCH_SIZE', 100)
+SCORES = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+
+logger = logging.getLogger(__name__)
+
+# Sent with ``ratings`` ({user_id: new rating}) and ``previous`` ({user_id:
+# old rating}) by ``UserProfile.objects.bulk_update_ratings``, which
+# bypasses post_save.
+ratings_changed = Signal()
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def elo_update(white_rating, black_rating, white_score, k=K_FACTOR):
+    """New ``(white, black)`` ratings; the points gained equal the points lost."""
+    delta = round(k * (white_score - expected_score(white_rating, black_rating)))
+    return white_rating + delta, black_rating - delta
+
+
+def rateable(queryset):
+    return queryset.filter(
+        status='END',
+        rated=False,
+        result__in=SCORES,
+        player_white__isnull=False,
+        player_black__isnull=False,
+    ).exclude(player_white=F('player_black'))
+
+
+def rate_matches(match_ids):
+    """Apply the results of ``match_ids`` that are not rated yet; returns how many were."""
+    with transaction.atomic():
+        matches = list(
+            rateable(Match.objects.select_for_update().filter(id__in=match_ids))
+            .only('id', 'result', 'end_time', 'player_white_id', 'player_black_id')
+            .order_by('end_time', 'id')
+        )
+        if not matches:
+            return 0
+        Match.objects.filter(id__in=[m.id for m in matches]).update(rated=True)
+
+        user_ids = {m.player_white_id for m in matches} | {m.player_black_id for m in matches}
+        profiles = {p.user_id: p for p in UserProfile.objects.filter(user_id__in=user_ids)}
+        for user_id in user_ids - profiles.keys():
+            profiles[user_id] = UserProfile.objects.create(user_id=user_id)
+
+        history = []
+        for match in matches:
+            white = profiles[match.player_white_id]
+            black = profiles[match.player_black_id]
+            new_white, new_black = elo_update(white.rating, black.rating, SCORES[match.result])
+            history.append(RatingHistory(user_id=white.user_id, match_id=match.id,
+                                         rating_before=white.rating, rating_after=new_white))
+            history.append(RatingHistory(user_id=black.user_id, match_id=match.id,
+                                         rating_before=black.rating, rating_after=new_black))
+            white.rating, black.rating = new_white, new_black
+
+        UserProfile.objects.bulk_update_ratings(profiles.values())
+        RatingHistory.objects.bulk_create(history)
+        # Claimed above, so each game reaches PlayerStats exactly once too.
+        record_matches(matches)
+    return len(matches)
+
+
+class RatingQueue:
+    """Match ids waiting to be rated, drained by one daemon thread per process."""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, match_id):
+        """Queue ``match_id`` once the current transaction commits."""
+        transaction.on_commit(lambda: self._put(match_id))
+
+    def _put(self, match_id):
+        self._queue.put(match_id)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ratings', daemon=True)
+                self._thread.start()
+
+    def join(self):
+        """Block until everything queued so far has been rated."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                rate_matches(batch)
+            except Exception:
+                logger.exception('Rating update failed for matches %s', batch)
+            finally:
+                close_old_connections()
+                for _ in batch:
+                    self._queue.task_done()
+
+
+rating_queue = RatingQueue()
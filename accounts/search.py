@@ -0,0 +1,139 @@
+"""
+Profile directory search and paging.
+
+A query is matched against usernames and full names without scanning
+the user table. Where SQLite has FTS5, queries of three or more
+characters go through a trigram index (the ``accounts_user_search``
+virtual table, one row per user keyed by user id), so any substring
+matches. Shorter queries, and databases without FTS5, use SearchTerm:
+each word of the username and name, lowercased, matched by prefix as an
+index range scan. ``accounts.signals`` keeps both in step with the
+users.
+
+Results are paged by keyset on (rating desc, user id), the leaderboard
+order, so each page is an index range scan whatever the page number.
+Rating-bucket counts for the whole club come from the rank index; for a
+search they are one aggregate over the matches.
+"""
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+
+from leaderboard.ranks import rank_index
+
+from .models import SearchTerm
+
+FTS_TABLE = "accounts_user_search"
+TRIGRAM = 3
+# (label, lowest rating, first rating above the bucket)
+RATING_BUCKETS = [
+    ("2000+", 2000, None),
+    ("1800-1999", 1800, 2000),
+    ("1600-1799", 1600, 1800),
+    ("1400-1599", 1400, 1600),
+    ("<1400", None, 1400),
+]
+BUCKETS = {label: (low, high) for label, low, high in RATING_BUCKETS}
+
+_fts_available = None
+
+
+def normalize(query):
+    return " ".join(query.lower().split())
+
+
+def search_text(user):
+    return f"{user.username} {user.first_name} {user.last_name}".strip()
+
+
+def terms(user):
+    """The words ``user`` can be found by, plus the full name for "first la..." queries."""
+    found = set(normalize(search_text(user)).split())
+    full_name = normalize(f"{user.first_name} {user.last_name}")
+    if " " in full_name:
+        found.add(full_name)
+    return {term[:150] for term in found}
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = False
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def index_user(user):
+    SearchTerm.objects.filter(user=user).delete()
+    SearchTerm.objects.bulk_create(SearchTerm(user=user, term=term) for term in terms(user))
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [user.pk])
+            cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, name) VALUES (%s, %s)", [user.pk, search_text(user)])
+
+
+def unindex_user(user_id):
+    # SearchTerm rows go with the user by cascade.
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [user_id])
+
+
+def matching_users(query):
+    """
+    Something to filter user ids ``__in``: the users matching ``query``,
+    which must already be normalized and non-empty.
+    """
+    if len(query) >= TRIGRAM and fts_available():
+        phrase = '"{}"'.format(query.replace('"', '""'))
+        return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [phrase])
+    return SearchTerm.objects.filter(term__gte=query, term__lt=query + "\uffff").values("user_id")
+
+
+def bucket_filter(label, field="rating"):
+    low, high = BUCKETS[label]
+    q = Q()
+    if low is not None:
+        q &= Q(**{f"{field}__gte": low})
+    if high is not None:
+        q &= Q(**{f"{field}__lt": high})
+    return q
+
+
+def facet_counts(profiles=None):
+    """
+    ``{bucket: players}``. Without ``profiles`` this counts the whole club
+    from the rank index; otherwise it is one aggregate over ``profiles``.
+    """
+    if profiles is None:
+        return {label: rank_index.count_between(low, high) for label, low, high in RATING_BUCKETS}
+    counts = profiles.order_by().aggregate(**{
+        f"bucket_{i}": Count("pk", filter=bucket_filter(label)) for i, label in enumerate(BUCKETS)
+    })
+    return {label: counts[f"bucket_{i}"] for i, label in enumerate(BUCKETS)}
+
+
+def encode_cursor(rating, user_id):
+    return f"{rating}.{user_id}"
+
+
+def decode_cursor(cursor):
+    """``(rating, user_id)`` of a cursor; ValueError if it is malformed."""
+    rating, _, user_id = cursor.partition(".")
+    return int(rating), int(user_id)
+
+
+def page(profiles, cursor=None, limit=20):
+    """One page of ``profiles`` by rating, highest first; returns ``(rows, next_cursor)``."""
+    profiles = profiles.order_by("-rating", "user_id")
+    if cursor:
+        rating, user_id = decode_cursor(cursor)
+        profiles = profiles.filter(Q(rating__lt=rating) | Q(rating=rating, user_id__gt=user_id))
+    rows = list(profiles[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].rating, rows[-1].user_id)
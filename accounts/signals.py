@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from match.models import Match
+from match.signals import match_ended
+from tournaments.models import TournamentMatch
+from . import history, stats
 from .models import UserProfile
+from .ratings import rating_queue, ratings_changed
+from .search import index_user, unindex_user
 
 User = get_user_model()
 
@@ -10,3 +16,90 @@ def create_user_profile(sender, instance, created, **kwargs):
     """Create a UserProfile automatically when a new User is created."""
     if created:
         UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    """Reindex a user's name when it may have changed (not on every login)."""
+    if update_fields and not set(update_fields) & {"username", "first_name", "last_name"}:
+        return
+    index_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_user(instance.pk)
+
+
+@receiver(match_ended)
+def queue_rating_update(sender, match, **kwargs):
+    """Rate a finished match off the request/consumer that ended it."""
+    rating_queue.put(match.id)
+
+
+# Club counters (accounts.stats); each bump joins the writer's transaction.
+
+@receiver(post_save, sender=User)
+def count_user(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(users=1)
+
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    stats.bump(users=-1)
+
+
+@receiver(post_save, sender=UserProfile)
+def count_profile(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        stats.bump(profiles=1, rating_total=instance.rating)
+    elif update_fields is None or "rating" in update_fields:
+        # save() leaves the previous rating here until after post_save.
+        loaded = instance._loaded_rating
+        if loaded is not None:
+            stats.bump(rating_total=instance.rating - loaded)
+
+
+@receiver(post_delete, sender=UserProfile)
+def uncount_profile(sender, instance, **kwargs):
+    stats.bump(profiles=-1, rating_total=-instance.rating)
+
+
+@receiver(ratings_changed)
+def count_rating_changes(sender, ratings, previous=None, **kwargs):
+    if previous is not None:
+        stats.bump(rating_total=sum(ratings.values()) - sum(previous.values()))
+
+
+@receiver(post_save, sender=Match)
+def count_match(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(matches=1)
+
+
+@receiver(post_delete, sender=Match)
+def uncount_match(sender, instance, **kwargs):
+    stats.bump(matches=-1)
+
+
+@receiver(post_save, sender=TournamentMatch)
+def count_tournament_match(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(tournament_matches=1)
+
+
+@receiver(post_delete, sender=TournamentMatch)
+def uncount_tournament_match(sender, instance, **kwargs):
+    stats.bump(tournament_matches=-1)
+
+
+@receiver(post_save, sender=TournamentMatch)
+def record_tournament_result(sender, instance, created, update_fields=None, **kwargs):
+    """Count an entered tournament result into PlayerStats (see accounts.history)."""
+    if update_fields and "result" not in update_fields:
+        return
+    before = "PENDING" if created else instance._loaded_result
+    instance._loaded_result = instance.result
+    if before != instance.result:
+        history.record_pairing(instance, before)
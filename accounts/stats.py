@@ -0,0 +1,73 @@
+"""
+Club-wide counters for the profile page.
+
+Member, profile, game and tournament-game counts and the sum of all
+ratings are kept as ClubStat rows. ``accounts.signals`` bumps them with
+``F()`` updates as rows are created, deleted or re-rated, in the same
+transaction as the change, so reading them is one query however big the
+club gets.
+
+Writes that skip signals (``QuerySet.update``, ``bulk_create``, raw SQL)
+make them drift; ``reconcile_stats`` recounts everything and should run
+periodically, e.g. from cron.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from match.models import Match
+from tournaments.models import TournamentMatch
+
+from .models import ClubStat, User, UserProfile
+
+USERS = "users"
+PROFILES = "profiles"
+RATING_TOTAL = "rating_total"
+MATCHES = "matches"
+TOURNAMENT_MATCHES = "tournament_matches"
+STATS = (USERS, PROFILES, RATING_TOTAL, MATCHES, TOURNAMENT_MATCHES)
+
+
+def bump(**deltas):
+    """Add each ``name=delta`` to its counter."""
+    for name, delta in deltas.items():
+        if delta:
+            ClubStat.objects.filter(name=name).update(value=F("value") + delta)
+
+
+def actual():
+    """Every counter recounted from the tables it summarizes."""
+    profiles = UserProfile.objects.aggregate(count=Count("pk"), total=Sum("rating"))
+    return {
+        USERS: User.objects.count(),
+        PROFILES: profiles["count"],
+        RATING_TOTAL: profiles["total"] or 0,
+        MATCHES: Match.objects.count(),
+        TOURNAMENT_MATCHES: TournamentMatch.objects.count(),
+    }
+
+
+def reconcile():
+    """Overwrite the counters with a recount; returns ``{name: (stored, actual)}`` for those that drifted."""
+    with transaction.atomic():
+        # A bump from a transaction still in flight, whose change the recount
+        # cannot see, waits for these rows and then applies on top of it.
+        stored = dict(ClubStat.objects.select_for_update().values_list("name", "value"))
+        counted = actual()
+        ClubStat.objects.bulk_create(
+            [ClubStat(name=name, value=value) for name, value in counted.items()],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["value"],
+        )
+    return {
+        name: (stored.get(name), value)
+        for name, value in counted.items() if stored.get(name) != value
+    }
+
+
+def club_stats():
+    """The counters plus ``avg_rating``. Read-only: a missing counter reads 0 until ``reconcile_stats`` runs."""
+    stored = dict(ClubStat.objects.values_list("name", "value"))
+    stats = {name: stored.get(name, 0) for name in STATS}
+    stats["avg_rating"] = stats[RATING_TOTAL] // stats[PROFILES] if stats[PROFILES] else 0
+    return stats
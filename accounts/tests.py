@@ -0,0 +1,101 @@
+import json
+
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from leaderboard.ranks import rank_index
+from match.models import Match
+
+from . import views
+from .models import RatingHistory, User, UserProfile
+from .ratings import elo_update, expected_score, rate_matches
+
+
+class ProfileDirectoryQueryBudgetTests(TestCase):
+    """A directory page costs the same few queries whatever the club size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(30):
+            user = User.objects.create(username=f'member{i}', first_name='Club', last_name=f'Member{i}')
+            UserProfile.objects.filter(user=user).update(rating=1200 + 50 * i)
+
+    def setUp(self):
+        rank_index.rebuild(UserProfile.objects.values_list('user_id', 'rating'))
+
+    def get(self, **params):
+        return views.api_profiles(RequestFactory().get('/api/profiles/', params))
+
+    def test_first_page(self):
+        with self.assertNumQueries(1):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+
+    def test_next_page(self):
+        cursor = json.loads(self.get().content)['next']
+        with self.assertNumQueries(1):
+            response = self.get(cursor=cursor)
+        self.assertEqual(response.status_code, 200)
+
+    def test_search(self):
+        for query in ('member1', 'me'):
+            with self.subTest(query=query), self.assertNumQueries(2):
+                response = self.get(search=query, rating='1600-1799')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(json.loads(response.content)['profiles'])
+
+
+class RatingTrackingTests(TestCase):
+    def test_save_without_rating_keeps_loaded_rating(self):
+        user = User.objects.create(username='tracked')
+        UserProfile.objects.filter(user=user).update(last_rating=0)
+        profile = UserProfile.objects.get(user=user)
+        stored = profile.rating
+        profile.rating = stored + 40
+        profile.lichess = 'tracked'
+        profile.save(update_fields=['lichess'])
+        profile.save(update_fields=['rating'])
+        profile.refresh_from_db()
+        self.assertEqual((profile.rating, profile.last_rating), (stored + 40, stored))
+
+
+class EloTests(TestCase):
+    def test_expected_score(self):
+        self.assertEqual(expected_score(1500, 1500), 0.5)
+        self.assertAlmostEqual(expected_score(1900, 1500), 10 / 11)
+        self.assertAlmostEqual(expected_score(1500, 1900) + expected_score(1900, 1500), 1)
+
+    def test_update_is_zero_sum(self):
+        self.assertEqual(elo_update(1500, 1500, 1.0), (1516, 1484))
+        self.assertEqual(elo_update(1500, 1500, 0.5), (1500, 1500))
+        self.assertEqual(elo_update(1900, 1500, 0.0, k=20), (1882, 1518))
+
+
+class RateMatchesTests(TestCase):
+    def setUp(self):
+        self.white = User.objects.create(username='rated_white')
+        self.black = User.objects.create(username='rated_black')
+        self.match = Match.objects.create(
+            player_white=self.white, player_black=self.black,
+            status='END', result='1-0', end_time=timezone.now(),
+        )
+
+    def ratings(self):
+        return dict(UserProfile.objects.filter(user__in=[self.white, self.black]).values_list('user_id', 'rating'))
+
+    def test_rates_each_match_once(self):
+        before = self.ratings()
+        self.assertEqual(rate_matches([self.match.id, self.match.id]), 1)
+        after = self.ratings()
+        self.assertEqual(rate_matches([self.match.id]), 0)
+        self.assertEqual(self.ratings(), after)
+        self.assertGreater(after[self.white.id], before[self.white.id])
+        self.assertEqual(after[self.white.id] + after[self.black.id], sum(before.values()))
+        self.assertEqual(RatingHistory.objects.filter(match=self.match).count(), 2)
+        self.match.refresh_from_db()
+        self.assertTrue(self.match.rated)
+
+    def test_skips_unfinished_matches(self):
+        Match.objects.filter(id=self.match.id).update(status='LIVE', result='*')
+        self.assertEqual(rate_matches([self.match.id]), 0)
+        self.assertFalse(RatingHistory.objects.exists())
@@ -1,14 +1,24 @@
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect
-from django.db.models import Q, Avg
+from django.db.models import Q
 from django.views.decorators.http import require_GET
 
+from IIITChessClub.metrics import query_budget
+from leaderboard.ranks import around, rank_index, with_users
+
+from .history import history_page, player_stats
 from .models import User, UserProfile
-from tournaments.models import TournamentResult, TournamentMatch
+from .search import BUCKETS, bucket_filter, facet_counts, matching_users, normalize, page
+from .stats import club_stats
+from tournaments.models import TournamentResult
+
+PROFILE_PAGE_SIZE = getattr(settings, 'PROFILE_PAGE_SIZE', 20)
 
 def user_profile(request, username):
-    user = User.objects.filter(username=username).first()
+    user = User.objects.select_related('profile').filter(username=username).first()
+    if not user:
+        return redirect("/")
     results = (
         TournamentResult.objects
         .filter(player=user)
@@ -24,15 +34,18 @@ def user_profile(request, username):
             "result": r.result_text(),
             "result_class": r.badge_class(),
         })
-        
-    matches_obj = user.matches
+
+    try:
+        pairings, next_cursor = history_page(user, request.GET.get('before'))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid page cursor.")
     matches = []
-    for m in matches_obj:
-        opponent = m.player2 if m.player1 == user else m.player1
+    for m in pairings:
+        opponent = m.player2 if m.player1_id == user.id else m.player1
         
         if m.result == 'DRAW':
             result_class = "badge-warning"
-        elif (m.result == 'PLAYER1' and m.player1 == user) or (m.result == 'PLAYER2' and m.player2 == user):
+        elif (m.result == 'PLAYER1' and m.player1_id == user.id) or (m.result == 'PLAYER2' and m.player2_id == user.id):
             result_class = "badge-success"
         elif m.result != 'PENDING':
             result_class = "badge-danger"
@@ -43,57 +56,78 @@ def user_profile(request, username):
             "result": m.result,
             "opponent": opponent,
             "date": m.scheduled_at,
-            "fen": getattr(m, "fen", None),
+            "fen": m.fen,
         })
-    if not user:
-        return redirect("/")
-    return render(request, 'profile_view.html', context={"user":user, "tournaments":tournaments, "matches": matches})
+    return render(request, 'profile_view.html', context={
+        "user": user,
+        "tournaments": tournaments,
+        "matches": matches,
+        "matches_next": next_cursor,
+        "paged": 'before' in request.GET,
+        "stats": player_stats(user),
+    })
 
 def profile(request):
-    users = User.objects.all()
-    active_count = len(users)
-    avg_rating = int(UserProfile.objects.aggregate(avg=Avg('rating'))['avg'])
-    match_count = len(TournamentMatch.objects.all())
+    stats = club_stats()
     curr_user = None
+    curr_rank = None
+    nearby = []
     if request.user.is_authenticated:
         curr_user = request.user
+        nearby = with_users(around(rank_index, curr_user.id))
+        curr_rank = next((entry["rank"] for entry in nearby if entry["user"].id == curr_user.id), None)
     return render(request, 'profile.html',
                   {
-                      "active_count": active_count,
-                      "avg_rating": avg_rating,
-                      "match_count": match_count,
+                      "active_count": stats["users"],
+                      "avg_rating": stats["avg_rating"],
+                      "match_count": stats["tournament_matches"],
                       "curr_user": curr_user,
+                      "curr_rank": curr_rank,
+                      "nearby": nearby,
                       })
 
 @require_GET
+@query_budget(3)
 def api_profiles(request):
-    search = request.GET.get('search', '')
+    """
+    The profile directory, strongest first, ``PROFILE_PAGE_SIZE`` at a
+    time: pass the previous response's ``next`` as ``cursor`` for more.
+    ``search`` matches usernames and names, ``rating`` is one of the
+    ``facets`` buckets.
+    """
+    search = normalize(request.GET.get('search', ''))
     rating = request.GET.get('rating', '')
+    if rating and rating not in BUCKETS:
+        return JsonResponse({'success': False, 'error': 'Unknown rating bucket'}, status=400)
 
-    users = User.objects.select_related('profile').all()
-
+    profiles = UserProfile.objects.select_related('user').only(
+        'rating', 'user__username', 'user__first_name', 'user__last_name'
+    )
     if search:
-        users = users.filter(username__icontains=search)
-
+        profiles = profiles.filter(user_id__in=matching_users(search))
+    facets = facet_counts(profiles if search else None)
     if rating:
-        if rating == '2000+':
-            users = users.filter(profile__rating__gte=2000)
-        elif rating == '1800-1999':
-            users = users.filter(profile__rating__gte=1800, profile__rating__lte=1999)
-        elif rating == '1600-1799':
-            users = users.filter(profile__rating__gte=1600, profile__rating__lte=1799)
-        elif rating == '1400-1599':
-            users = users.filter(profile__rating__gte=1400, profile__rating__lte=1599)
-        elif rating == '<1400':
-            users = users.filter(profile__rating__lt=1400)
+        profiles = profiles.filter(bucket_filter(rating))
+    try:
+        rows, next_cursor = page(profiles, request.GET.get('cursor'), PROFILE_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
 
+    # Overall rank, not the position within the filtered list.
+    ranks = rank_index.ranks([profile.user_id for profile in rows])
     data = []
-    for index, user in enumerate(users, start=1):
+    for profile in rows:
+        user = profile.user
         data.append({
             "username": user.username,
             "name": f"{user.first_name} {user.last_name}".strip() or user.username,
-            "rating": user.profile.rating,
-            "rank": index,  # ✅ dynamic rank
+            "rating": profile.rating,
+            "rank": ranks.get(user.id),
             "profile_url": f"/profile/{user.username}/",
         })
-    return JsonResponse({"profiles": data})
\ No newline at end of file
+    return JsonResponse({
+        "profiles": data,
+        "next": next_cursor,
+        "facets": facets,
+        "total": facets[rating] if rating else sum(facets.values()),
+    })
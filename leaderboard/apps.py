@@ -4,4 +4,7 @@ import os
 class LeaderboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'leaderboard'
-    path = os.path.dirname(os.path.abspath(__file__))
\ No newline at end of file
+    path = os.path.dirname(os.path.abspath(__file__))
+
+    def ready(self):
+        import leaderboard.signals
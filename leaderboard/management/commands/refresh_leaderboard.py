@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from leaderboard.ranks import all_ratings, rank_index
+from leaderboard.snapshot import refresh
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized leaderboard and the rank index from current ratings"
+
+    def handle(self, *args, **options):
+        changed = refresh()
+        self.stdout.write(f"Updated {changed} leaderboard entries")
+        rank_index.rebuild(all_ratings())
+        self.stdout.write(f"Rebuilt the rank index ({type(rank_index._get()).__name__}, {len(rank_index)} players)")
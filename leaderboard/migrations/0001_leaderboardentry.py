@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_leaderboard(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    LeaderboardEntry = apps.get_model('leaderboard', 'LeaderboardEntry')
+    ranked = UserProfile.objects.order_by('-rating', 'user_id').values_list('user_id', 'rating', 'last_rating', 'rank')
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(
+                user_id=user_id, rank=rank, last_rank=old_rank or rank,
+                rating=rating, rating_change=rating - last_rating,
+            )
+            for rank, (user_id, rating, last_rating, old_rank) in enumerate(ranked, start=1)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0005_ratinghistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(db_index=True)),
+                ('last_rank', models.PositiveIntegerField()),
+                ('rating', models.IntegerField()),
+                ('rating_change', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'leaderboard entries',
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import models
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A player's place in the overall rankings, materialized by
+    ``leaderboard.snapshot.refresh`` whenever ratings change.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="leaderboard_entry")
+    rank = models.PositiveIntegerField(db_index=True)
+    last_rank = models.PositiveIntegerField()
+    rating = models.IntegerField()
+    rating_change = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["rank"]
+        verbose_name_plural = "leaderboard entries"
+
+    def __str__(self):
+        return f"#{self.rank} {self.user.username}"
+
+    @property
+    def rank_change(self):
+        return self.last_rank - self.rank
+
+    @property
+    def moved_up(self):
+        return self.rank < self.last_rank
+
+    @property
+    def moved_down(self):
+        return self.rank > self.last_rank
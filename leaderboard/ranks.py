@@ -0,0 +1,266 @@
+"""
+Rank index over player ratings.
+
+Answers "what is X's rank", "who is ranked 100-150", "who is around X"
+and "how many are rated 1600-1799" in O(log n) without scanning the user
+table. Players are ordered by
+rating, highest first, ties broken by user id as in the materialized
+leaderboard.
+
+Backed by a Redis sorted set when ``REDIS_URL`` is reachable, so every
+worker shares one index. Otherwise each process keeps a SortedList,
+loaded from the database on first use and reloaded every
+``RANK_INDEX_LOCAL_TTL`` seconds to pick up changes made elsewhere. Both
+are kept in step with rating changes by ``leaderboard.signals`` and
+rebuilt from the database by every leaderboard refresh, so an update that
+was lost (a write that skipped signals, a worker that fell back to its own
+index) does not stick. The Redis set also expires after
+``RANK_INDEX_REDIS_TTL`` seconds, to be reloaded on the next read.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from sortedcontainers import SortedList
+
+from accounts.models import User, UserProfile
+
+REDIS_KEY = getattr(settings, 'RANK_INDEX_KEY', 'chessclub:ratings')
+LOCAL_TTL = getattr(settings, 'RANK_INDEX_LOCAL_TTL', 60)
+REDIS_TTL = getattr(settings, 'RANK_INDEX_REDIS_TTL', 3600)
+# Redis orders equal scores by member, so the user id is folded into the
+# score: rating * SCALE - user_id sorts by rating, then by lowest id.
+SCALE = 10 ** 9
+LOAD_BATCH_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+
+def all_ratings():
+    return UserProfile.objects.values_list('user_id', 'rating').iterator(chunk_size=LOAD_BATCH_SIZE)
+
+
+class LocalRankIndex:
+    def __init__(self, ttl=LOCAL_TTL):
+        self.ttl = ttl
+        self._keys = SortedList()
+        self._ratings = {}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    def _fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.rebuild(all_ratings())
+
+    def rebuild(self, ratings):
+        ratings = dict(ratings)
+        keys = SortedList((-rating, user_id) for user_id, rating in ratings.items())
+        with self._lock:
+            self._ratings, self._keys = ratings, keys
+            self._loaded_at = time.monotonic()
+
+    def update(self, ratings):
+        """Set the rating of each ``{user_id: rating}``."""
+        with self._lock:
+            for user_id, rating in ratings.items():
+                old = self._ratings.get(user_id)
+                if old is not None:
+                    self._keys.discard((-old, user_id))
+                self._ratings[user_id] = rating
+                self._keys.add((-rating, user_id))
+
+    def remove(self, user_id):
+        with self._lock:
+            old = self._ratings.pop(user_id, None)
+            if old is not None:
+                self._keys.discard((-old, user_id))
+
+    def __len__(self):
+        with self._lock:
+            self._fresh()
+            return len(self._keys)
+
+    def rank(self, user_id):
+        """1-based rank of ``user_id``, or None if unrated."""
+        with self._lock:
+            self._fresh()
+            rating = self._ratings.get(user_id)
+            if rating is None:
+                return None
+            return self._keys.index((-rating, user_id)) + 1
+
+    def ranks(self, user_ids):
+        """``{user_id: rank}`` for the rated users among ``user_ids``."""
+        with self._lock:
+            self._fresh()
+            return {
+                user_id: self._keys.index((-self._ratings[user_id], user_id)) + 1
+                for user_id in user_ids if user_id in self._ratings
+            }
+
+    def range(self, first, last):
+        """``(rank, user_id, rating)`` for ranks ``first`` to ``last`` inclusive."""
+        first = max(first, 1)
+        with self._lock:
+            self._fresh()
+            return [
+                (rank, user_id, -negated)
+                for rank, (negated, user_id) in enumerate(self._keys[first - 1:last], start=first)
+            ]
+
+    def count_between(self, low=None, high=None):
+        """How many players are rated at least ``low`` and below ``high``."""
+        with self._lock:
+            self._fresh()
+            # Keys run from the highest rating down, so ``high`` bounds the start.
+            start = 0 if high is None else self._keys.bisect_right((-high, float('inf')))
+            stop = len(self._keys) if low is None else self._keys.bisect_right((-low, float('inf')))
+            return max(stop - start, 0)
+
+
+class RedisRankIndex:
+    def __init__(self, client, key=REDIS_KEY):
+        self.client = client
+        self.key = key
+
+    @staticmethod
+    def _score(user_id, rating):
+        return rating * SCALE - user_id
+
+    @staticmethod
+    def _rating(user_id, score):
+        return round((score + user_id) / SCALE)
+
+    def _fresh(self):
+        if not self.client.exists(self.key):
+            self.rebuild(all_ratings())
+
+    def rebuild(self, ratings):
+        # Each rebuild stages its own copy, so concurrent ones cannot mix.
+        staging = f'{self.key}:rebuild:{uuid.uuid4().hex}'
+        pipe = self.client.pipeline(transaction=False)
+        batch = {}
+        for user_id, rating in ratings:
+            batch[user_id] = self._score(user_id, rating)
+            if len(batch) >= LOAD_BATCH_SIZE:
+                pipe.zadd(staging, batch)
+                batch = {}
+        if batch:
+            pipe.zadd(staging, batch)
+        # A rebuild that dies half way leaves nothing behind for long.
+        pipe.expire(staging, REDIS_TTL)
+        pipe.execute()
+        if self.client.exists(staging):
+            pipe = self.client.pipeline()
+            pipe.rename(staging, self.key)
+            pipe.expire(self.key, REDIS_TTL)
+            pipe.execute()
+        else:
+            self.client.delete(self.key)
+
+    def update(self, ratings):
+        # Until the set is built, the first read loads it from the database.
+        if ratings and self.client.exists(self.key):
+            self.client.zadd(self.key, {
+                user_id: self._score(user_id, rating) for user_id, rating in ratings.items()
+            })
+
+    def remove(self, user_id):
+        self.client.zrem(self.key, user_id)
+
+    def __len__(self):
+        self._fresh()
+        return self.client.zcard(self.key)
+
+    def rank(self, user_id):
+        self._fresh()
+        rank = self.client.zrevrank(self.key, user_id)
+        return None if rank is None else rank + 1
+
+    def ranks(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        self._fresh()
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zrevrank(self.key, user_id)
+        return {
+            user_id: rank + 1
+            for user_id, rank in zip(user_ids, pipe.execute()) if rank is not None
+        }
+
+    def range(self, first, last):
+        first = max(first, 1)
+        if last < first:
+            return []
+        self._fresh()
+        members = self.client.zrevrange(self.key, first - 1, last - 1, withscores=True)
+        result = []
+        for rank, (member, score) in enumerate(members, start=first):
+            user_id = int(member)
+            result.append((rank, user_id, self._rating(user_id, score)))
+        return result
+
+    def count_between(self, low=None, high=None):
+        # Rating r scores strictly between (r - 1) * SCALE and r * SCALE.
+        self._fresh()
+        low = '-inf' if low is None else f'({(low - 1) * SCALE}'
+        high = '+inf' if high is None else f'({(high - 1) * SCALE}'
+        return self.client.zcount(self.key, low, high)
+
+
+def around(index, user_id, radius=2):
+    """The players ranked within ``radius`` places of ``user_id``."""
+    rank = index.rank(user_id)
+    if rank is None:
+        return []
+    return index.range(rank - radius, rank + radius)
+
+
+def with_users(ranked):
+    """``range`` results as ``{'rank', 'rating', 'user'}`` dicts, in one query."""
+    users = User.objects.only('username', 'first_name', 'last_name').in_bulk([user_id for _, user_id, _ in ranked])
+    return [
+        {'rank': rank, 'rating': rating, 'user': users[user_id]}
+        for rank, user_id, rating in ranked if user_id in users
+    ]
+
+
+def connect():
+    url = getattr(settings, 'RANK_INDEX_REDIS_URL', getattr(settings, 'REDIS_URL', None))
+    if url:
+        try:
+            import redis
+            client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=2)
+            client.ping()
+            return RedisRankIndex(client)
+        except Exception as e:
+            logger.warning('Rank index falling back to in-process: %s', e)
+    return LocalRankIndex()
+
+
+class _LazyIndex:
+    """Connects on first use, so importing this module never touches Redis."""
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = connect()
+        return self._index
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __len__(self):
+        return len(self._get())
+
+
+rank_index = _LazyIndex()
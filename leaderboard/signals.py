@@ -0,0 +1,48 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+from accounts.ratings import ratings_changed
+
+from .ranks import rank_index
+from .snapshot import refresh_soon
+
+logger = logging.getLogger(__name__)
+
+
+def _update_index(method, *args):
+    def apply():
+        try:
+            getattr(rank_index, method)(*args)
+        except Exception:
+            logger.exception('Rank index update failed')
+    transaction.on_commit(apply)
+
+
+@receiver(ratings_changed)
+def refresh_after_rating(sender, ratings, **kwargs):
+    if ratings:
+        _update_index('update', ratings)
+        refresh_soon()
+
+
+@receiver(post_save, sender=UserProfile)
+def refresh_after_profile_save(sender, instance, created, update_fields=None, **kwargs):
+    # Only a new player or a new rating moves the rankings. save() keeps the
+    # rating it replaced in _loaded_rating until post_save has run.
+    if not created:
+        if update_fields is not None and 'rating' not in update_fields:
+            return
+        if instance.rating == instance._loaded_rating:
+            return
+    _update_index('update', {instance.user_id: instance.rating})
+    refresh_soon()
+
+
+@receiver(post_delete, sender=UserProfile)
+def refresh_after_profile_delete(sender, instance, **kwargs):
+    _update_index('remove', instance.user_id)
+    refresh_soon()
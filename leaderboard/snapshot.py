@@ -0,0 +1,129 @@
+"""
+The materialized leaderboard.
+
+Ranks are recomputed from ``UserProfile.rating`` whenever ratings change
+and only the rows whose rank, rating or rating change moved are written,
+with one bulk upsert, so reading the leaderboard never writes. Ties in
+rating are broken by user id so ranks are stable between refreshes.
+
+``UserProfile.rank``/``last_rank`` are kept in step for the pages that
+still read them.
+
+Rating changes call ``refresh_soon``, which coalesces bursts (a batch of
+rated games, a bulk import) into one refresh on a background thread.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from accounts.models import UserProfile
+
+from .models import LeaderboardEntry
+from .ranks import rank_index
+
+REFRESH_DELAY = getattr(settings, 'LEADERBOARD_REFRESH_DELAY', 0.5)
+# A failed refresh is retried after this, doubling up to the maximum.
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+UPSERT_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def refresh():
+    """Recompute every rank; returns how many entries changed."""
+    with transaction.atomic():
+        ranked = (
+            UserProfile.objects
+            .order_by('-rating', 'user_id')
+            .values_list('id', 'user_id', 'rating', 'last_rating', 'rank', 'last_rank')
+        )
+        current = {
+            user_id: (rank, last_rank, rating, rating_change)
+            for user_id, rank, last_rank, rating, rating_change in
+            LeaderboardEntry.objects.values_list('user_id', 'rank', 'last_rank', 'rating', 'rating_change')
+        }
+
+        entries = []
+        profiles = []
+        ratings = []
+        for rank, (profile_id, user_id, rating, last_rating, profile_rank, profile_last_rank) in enumerate(ranked, start=1):
+            ratings.append((user_id, rating))
+            old = current.pop(user_id, None)
+            if old is None:
+                last_rank = rank
+            else:
+                last_rank = old[0] if old[0] != rank else old[1]
+            row = (rank, last_rank, rating, rating - last_rating)
+            if row != old:
+                entries.append(LeaderboardEntry(
+                    user_id=user_id, rank=rank, last_rank=last_rank,
+                    rating=rating, rating_change=rating - last_rating,
+                ))
+            if (profile_rank, profile_last_rank) != (rank, last_rank):
+                profiles.append(UserProfile(id=profile_id, rank=rank, last_rank=last_rank))
+
+        LeaderboardEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['rank', 'last_rank', 'rating', 'rating_change'],
+            batch_size=UPSERT_BATCH_SIZE,
+        )
+        UserProfile.objects.bulk_update(profiles, ['rank', 'last_rank'], batch_size=UPSERT_BATCH_SIZE)
+        if current:
+            # Profiles that no longer exist.
+            LeaderboardEntry.objects.filter(user_id__in=list(current)).delete()
+    # Correct any update the rank index missed, from the ratings just ranked.
+    try:
+        rank_index.rebuild(ratings)
+    except Exception:
+        logger.exception('Rank index rebuild failed')
+    return len(entries)
+
+
+class Refresher:
+    """Runs ``refresh`` on a daemon thread, once per burst of requests."""
+
+    def __init__(self, delay=REFRESH_DELAY):
+        self.delay = delay
+        self._wanted = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def request(self):
+        self._wanted.set()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='leaderboard', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        retry_delay = RETRY_DELAY
+        while True:
+            self._wanted.wait()
+            # Let the rest of the burst arrive before reading ratings.
+            time.sleep(self.delay)
+            self._wanted.clear()
+            try:
+                refresh()
+            except Exception:
+                logger.exception('Leaderboard refresh failed, retrying in %gs', retry_delay)
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                self._wanted.set()
+            else:
+                retry_delay = RETRY_DELAY
+            finally:
+                close_old_connections()
+
+
+refresher = Refresher()
+
+
+def refresh_soon():
+    """Refresh the leaderboard after the current transaction commits."""
+    transaction.on_commit(refresher.request)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase
+
+from accounts.models import User, UserProfile
+
+from . import views
+from .ranks import LocalRankIndex
+from .snapshot import refresh
+
+
+class LeaderboardQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(views.PAGE_SIZE + 10):
+            user = User.objects.create(username=f'ranked{i}')
+            UserProfile.objects.filter(user=user).update(rating=1000 + i)
+        refresh()
+
+    def test_page(self):
+        for page in ('1', '2'):
+            with self.subTest(page=page), self.assertNumQueries(1):
+                response = views.leaderboard(RequestFactory().get('/leaderboard', {'page': page}))
+            self.assertEqual(response.status_code, 200)
+
+
+class ProfileSaveRefreshTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create(username='rated').profile
+        self.profile = UserProfile.objects.get(pk=self.profile.pk)
+
+    def refreshes(self, **changes):
+        for field, value in changes.items():
+            setattr(self.profile, field, value)
+        with mock.patch('leaderboard.signals.refresh_soon') as refresh_soon:
+            self.profile.save()
+        return refresh_soon.called
+
+    def test_rating_change_refreshes(self):
+        self.assertTrue(self.refreshes(rating=self.profile.rating + 25))
+
+    def test_other_fields_do_not_refresh(self):
+        self.assertFalse(self.refreshes(lichess='rated', chessdotcom='rated'))
+
+
+class LocalRankIndexTests(TestCase):
+    def setUp(self):
+        self.index = LocalRankIndex()
+        self.index.rebuild([(1, 1500), (2, 1700), (3, 1500), (4, 1200), (5, 1800)])
+
+    def test_rank(self):
+        # Highest rating first; equal ratings by lowest user id.
+        self.assertEqual([self.index.rank(user_id) for user_id in (5, 2, 1, 3, 4)], [1, 2, 3, 4, 5])
+        self.assertIsNone(self.index.rank(99))
+        self.assertEqual(self.index.ranks([3, 4, 99]), {3: 4, 4: 5})
+
+    def test_range(self):
+        self.assertEqual(self.index.range(2, 4), [(2, 2, 1700), (3, 1, 1500), (4, 3, 1500)])
+        self.assertEqual(self.index.range(0, 1), [(1, 5, 1800)])
+        self.assertEqual(self.index.range(5, 10), [(5, 4, 1200)])
+
+    def test_count_between(self):
+        self.assertEqual(self.index.count_between(1500, 1800), 3)
+        self.assertEqual(self.index.count_between(1500, 1501), 2)
+        self.assertEqual(self.index.count_between(low=1700), 2)
+        self.assertEqual(self.index.count_between(high=1500), 1)
+        self.assertEqual(self.index.count_between(), 5)
+        self.assertEqual(self.index.count_between(1900, 2000), 0)
+
+    def test_update_and_remove(self):
+        self.index.update({4: 1900, 6: 1600})
+        self.assertEqual(self.index.rank(4), 1)
+        self.assertEqual(self.index.rank(6), 4)
+        self.index.remove(5)
+        self.assertIsNone(self.index.rank(5))
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.count_between(1500, 1700), 3)
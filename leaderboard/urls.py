@@ -3,4 +3,5 @@ from django.urls import path, include
 
 urlpatterns = [
     path('leaderboard', views.leaderboard, name='leaderboard'),
+    path('api/leaderboard/ranks/', views.api_ranks, name='api_ranks'),
 ]
\ No newline at end of file
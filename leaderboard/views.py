@@ -1,31 +1,77 @@
 from django.conf import settings
-from django.shortcuts import render, redirect
-from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render
+
+from IIITChessClub.metrics import query_budget
 
 from accounts.models import User
 
+from .models import LeaderboardEntry
+from .ranks import around, rank_index, with_users
+
+PAGE_SIZE = getattr(settings, 'LEADERBOARD_PAGE_SIZE', 50)
+MAX_RANK_SPAN = 100
+
+
+@query_budget(3)
 def leaderboard(request):
-    users = User.objects.all().order_by('-profile__rating')
-    leaderboard_data = []
-    with transaction.atomic():
-        for index, user in enumerate(users, start=1):
-            profile = user.profile
-            current_rank = index
-            
-            if profile.rank != current_rank:
-                profile.last_rank = profile.rank or current_rank
-                profile.rank = current_rank
-                profile.save(update_fields=['rank', 'last_rank'])
-                
-            rank_change = (profile.last_rank or current_rank) - current_rank
-
-            leaderboard_data.append({
-                "user": user,
-                "current_rank": current_rank,
-                "rank_change": rank_change,
-                "moved_up": current_rank < profile.last_rank,
-                "moved_down": current_rank > profile.last_rank,
-                "rating_change": profile.rating - profile.last_rating,
-            })
-    return render(request, 'leaderboard.html', {"leaderboard": leaderboard_data})
-    
\ No newline at end of file
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid page.")
+    if page < 1:
+        return HttpResponseBadRequest("Invalid page.")
+
+    # Ranks are dense, so a page is a range scan on the rank index.
+    first_rank = (page - 1) * PAGE_SIZE + 1
+    entries = list(
+        LeaderboardEntry.objects
+        .select_related('user')
+        .only('rank', 'last_rank', 'rating', 'rating_change',
+              'user__username', 'user__first_name', 'user__last_name')
+        .filter(rank__gte=first_rank, rank__lte=first_rank + PAGE_SIZE)
+        .order_by('rank')
+    )
+    has_next = len(entries) > PAGE_SIZE
+    return render(request, 'leaderboard.html', {
+        "leaderboard": entries[:PAGE_SIZE],
+        "page": page,
+        "previous_page": page - 1 if page > 1 else None,
+        "next_page": page + 1 if has_next else None,
+    })
+
+
+def api_ranks(request):
+    """
+    Players by rank: ``?first=100&last=150``, or ``?around=<username>``
+    with an optional ``radius`` (default 2).
+    """
+    try:
+        if 'around' in request.GET:
+            user = User.objects.filter(username=request.GET['around']).only('id').first()
+            if user is None:
+                return JsonResponse({'success': False, 'error': 'Unknown player'}, status=404)
+            radius = min(int(request.GET.get('radius', 2)), MAX_RANK_SPAN // 2)
+            ranked = around(rank_index, user.id, max(radius, 0))
+        else:
+            first = int(request.GET.get('first', 1))
+            last = int(request.GET.get('last', first + PAGE_SIZE - 1))
+            if first < 1 or last < first or last - first >= MAX_RANK_SPAN:
+                raise ValueError(f'Ranks must be a range of at most {MAX_RANK_SPAN} starting at 1 or above')
+            ranked = rank_index.range(first, last)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'total': len(rank_index),
+        'players': [
+            {
+                'rank': entry['rank'],
+                'rating': entry['rating'],
+                'username': entry['user'].username,
+                'name': f"{entry['user'].first_name} {entry['user'].last_name}".strip() or entry['user'].username,
+            }
+            for entry in with_users(ranked)
+        ],
+    })
@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import Match
+from .models import Match, MatchMove
+
+class MatchMoveInline(admin.TabularInline):
+    model = MatchMove
+    extra = 0
+    fields = ['ply', 'san', 'uci', 'fen']
+    readonly_fields = ['ply', 'san', 'uci', 'fen']
 
 @admin.register(Match)
 class MatchAdmin(admin.ModelAdmin):
     list_display = ['id', 'player_white', 'player_black', 'status', 'start_time']
     list_filter = ['status']
-    search_fields = ['player_white__username', 'player_black__username']
\ No newline at end of file
+    search_fields = ['player_white__username', 'player_black__username']
+    inlines = [MatchMoveInline]
@@ -0,0 +1,196 @@
+"""
+Cold storage for old finished games.
+
+Archived matches keep a narrow row (players, result, times, clocks and
+final FEN) so tournament pairings and per-player history still join
+against them, but their packed move list moves out of the database into
+append-only segment files::
+
+    <MATCH_ARCHIVE_DIR>/segment-00001.bin   zlib-compressed packed move lists
+    <MATCH_ARCHIVE_DIR>/index.bin           sorted (match id, segment, offset, length)
+
+The index is a flat array of fixed-width entries that readers memory-map
+and binary-search, so a lookup touches a handful of pages no matter how
+large the archive grows. Only the ``archive_matches`` command writes.
+Records are appended to a segment, then their entries to the index; as
+matches are archived in id order that keeps the index sorted, and it is
+only rewritten (atomically) when an older id turns up. A record is only
+referenced once it is fully on disk.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+
+INDEX_ENTRY = struct.Struct('<QIQI')
+SEGMENT_BYTES = getattr(settings, 'MATCH_ARCHIVE_SEGMENT_BYTES', 64 * 1024 * 1024)
+
+
+class Archive:
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_stat = None
+
+    @property
+    def index_path(self):
+        return self.root / 'index.bin'
+
+    def segment_path(self, segment):
+        return self.root / f'segment-{segment:05d}.bin'
+
+    def _entries(self):
+        """The memory-mapped index, remapped if the archiver replaced it."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key != self._index_stat:
+                if self._index is not None:
+                    self._index.close()
+                self._index = None
+                if stat.st_size:
+                    with open(self.index_path, 'rb') as handle:
+                        self._index = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                self._index_stat = key
+            return self._index
+
+    def locate(self, match_id):
+        """``(segment, offset, length)`` of ``match_id``'s record, or None."""
+        entries = self._entries()
+        if entries is None:
+            return None
+        low, high = 0, len(entries) // INDEX_ENTRY.size
+        while low < high:
+            mid = (low + high) // 2
+            entry_id, segment, offset, length = INDEX_ENTRY.unpack_from(entries, mid * INDEX_ENTRY.size)
+            if entry_id == match_id:
+                return segment, offset, length
+            if entry_id < match_id:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def get(self, match_id):
+        """The packed moves of an archived match, or None."""
+        location = self.locate(int(match_id))
+        if location is None:
+            return None
+        segment, offset, length = location
+        try:
+            handle = open(self.segment_path(segment), 'rb')
+        except FileNotFoundError:
+            return None
+        with handle:
+            handle.seek(offset)
+            return zlib.decompress(handle.read(length))
+
+    def writer(self):
+        return ArchiveWriter(self)
+
+
+def _lock(handle):
+    # fcntl is POSIX-only; Windows gets msvcrt's byte-range lock instead.
+    if os.name == 'nt':
+        import msvcrt
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle, fcntl.LOCK_EX)
+
+
+def _unlock(handle):
+    if os.name == 'nt':
+        import msvcrt
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class ArchiveWriter:
+    """Appends records; use as a context manager, one writer at a time."""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.pending = {}
+
+    def __enter__(self):
+        self.archive.root.mkdir(parents=True, exist_ok=True)
+        self._lockfile = open(self.archive.root / '.lock', 'w')
+        _lock(self._lockfile)
+        segments = sorted(self.archive.root.glob('segment-*.bin'))
+        self.segment = int(segments[-1].stem.split('-')[1]) if segments else 1
+        self._open_segment()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._segment.close()
+        _unlock(self._lockfile)
+        self._lockfile.close()
+
+    def _open_segment(self):
+        self._segment = open(self.archive.segment_path(self.segment), 'ab')
+
+    def append(self, match_id, packed_moves):
+        record = zlib.compress(bytes(packed_moves or b''))
+        if self._segment.tell() and self._segment.tell() + len(record) > SEGMENT_BYTES:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._segment.close()
+            self.segment += 1
+            self._open_segment()
+        offset = self._segment.tell()
+        self._segment.write(record)
+        self.pending[int(match_id)] = (self.segment, offset, len(record))
+
+    def commit(self):
+        """Make every appended record visible to readers."""
+        if not self.pending:
+            return
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+
+        index_path = self.archive.index_path
+        with open(index_path, 'ab+') as handle:
+            # Drop a torn entry left by a crash mid-append.
+            size = handle.tell() - handle.tell() % INDEX_ENTRY.size
+            handle.truncate(size)
+            last_id = -1
+            if size:
+                handle.seek(size - INDEX_ENTRY.size)
+                last_id = INDEX_ENTRY.unpack(handle.read(INDEX_ENTRY.size))[0]
+            if min(self.pending) > last_id:
+                for entry_id in sorted(self.pending):
+                    handle.write(INDEX_ENTRY.pack(entry_id, *self.pending[entry_id]))
+                handle.flush()
+                os.fsync(handle.fileno())
+                self.pending = {}
+                return
+            handle.seek(0)
+            data = handle.read(size)
+
+        entries = {entry_id: location for entry_id, *location in INDEX_ENTRY.iter_unpack(data)}
+        # A match archived twice (e.g. after a crash) points at its newest copy.
+        entries.update(self.pending)
+
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as handle:
+            for entry_id in sorted(entries):
+                handle.write(INDEX_ENTRY.pack(entry_id, *entries[entry_id]))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, index_path)
+        self.pending = {}
+
+
+archive = Archive(getattr(settings, 'MATCH_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
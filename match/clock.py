@@ -0,0 +1,226 @@
+"""
+Server-authoritative chess clocks.
+
+Each timed LiveGame owns a GameClock. Remaining time is charged to the
+mover whenever a move is committed, and flag-fall is detected by one
+ClockWheel per worker: a heap of (deadline, match, ply) entries drained by
+a single asyncio task, so thousands of timed games cost one sleeping task
+rather than one task per game.
+
+Clocks use wall time (``time.time()``) so the running side's remaining
+time can be recomputed from ``Match.clock_started_at`` after a reload.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import chess
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from .frames import group_broadcast
+from .lobby import publish as publish_lobby
+from .models import Match
+from .signals import match_ended
+
+# A flag-fall that could not be saved is tried again this much later.
+RETRY_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class GameClock:
+    def __init__(self, white_ms, black_ms, increment_ms, turn, running_since=None):
+        self.remaining = {'white': white_ms, 'black': black_ms}
+        self.increment_ms = increment_ms
+        self.turn = turn
+        # Wall-clock seconds when ``turn``'s clock started, or None until
+        # the first move has been played.
+        self.running_since = running_since
+
+    @classmethod
+    def from_match(cls, match, turn):
+        if not match.base_seconds:
+            return None
+        base_ms = match.base_seconds * 1000
+        started = match.clock_started_at
+        return cls(
+            match.white_clock_ms if match.white_clock_ms is not None else base_ms,
+            match.black_clock_ms if match.black_clock_ms is not None else base_ms,
+            match.increment_seconds * 1000,
+            turn,
+            started.timestamp() if started else None,
+        )
+
+    def time_left(self, color, now=None):
+        remaining = self.remaining[color]
+        if color == self.turn and self.running_since is not None:
+            now = time.time() if now is None else now
+            remaining -= int((now - self.running_since) * 1000)
+        return max(remaining, 0)
+
+    def flagged(self, now=None):
+        deadline = self.deadline()
+        return deadline is not None and (time.time() if now is None else now) >= deadline
+
+    def deadline(self):
+        """Wall time at which the side to move runs out, if the clock runs."""
+        if self.running_since is None:
+            return None
+        return self.running_since + self.remaining[self.turn] / 1000
+
+    def press(self, color, now):
+        """Stop ``color``'s clock after its move and start the opponent's."""
+        if self.running_since is not None:
+            self.remaining[color] = self.time_left(color, now) + self.increment_ms
+        self.turn = 'black' if color == 'white' else 'white'
+        self.running_since = now
+
+    def stop(self, now):
+        if self.running_since is not None:
+            self.remaining[self.turn] = self.time_left(self.turn, now)
+            self.running_since = None
+
+    def snapshot(self):
+        return dict(self.remaining), self.turn, self.running_since
+
+    def restore(self, snapshot):
+        remaining, self.turn, self.running_since = snapshot
+        self.remaining = dict(remaining)
+
+    def to_dict(self, now=None):
+        return {
+            'white': self.time_left('white', now),
+            'black': self.time_left('black', now),
+            'running': self.turn if self.running_since is not None else None,
+        }
+
+    def db_fields(self):
+        started = None
+        if self.running_since is not None:
+            started = datetime.fromtimestamp(self.running_since, tz=dt_timezone.utc)
+        return {
+            'white_clock_ms': self.remaining['white'],
+            'black_clock_ms': self.remaining['black'],
+            'clock_started_at': started,
+        }
+
+
+def timeout_result(game):
+    """Result and reason when the side to move in ``game`` runs out of time."""
+    loser = game.clock.turn
+    winner = 'black' if loser == 'white' else 'white'
+    if game.board.has_insufficient_material(chess.WHITE if winner == 'white' else chess.BLACK):
+        return '1/2-1/2', 'Draw by timeout vs insufficient material'
+    result = '1-0' if winner == 'white' else '0-1'
+    return result, f'{winner.title()} wins on time'
+
+
+async def end_on_time(game):
+    """
+    End ``game`` on time if its running clock has expired.
+
+    The caller must hold ``game.lock``. Returns the ``game_ended`` payload to
+    broadcast, or None if the clock has not run out or the row moved on.
+    """
+    clock = game.clock
+    if game.is_over or clock is None or not clock.flagged():
+        return None
+    result, reason = timeout_result(game)
+    snapshot = clock.snapshot()
+    clock.remaining[clock.turn] = 0
+    clock.running_since = None
+    try:
+        saved = await _save_timeout(game.match_id, game.ply, result, clock.db_fields())
+    except Exception:
+        clock.restore(snapshot)
+        raise
+    if not saved:
+        # Another writer got there first; the next commit will reload.
+        clock.restore(snapshot)
+        return None
+    game.finish(result)
+    return {
+        'type': 'game_ended',
+        'result': result,
+        'reason': reason,
+        'clock': clock.to_dict(),
+    }
+
+
+@database_sync_to_async
+def _save_timeout(match_id, ply, result, clock_fields):
+    updated = (
+        Match.objects
+        .filter(id=match_id, ply=ply)
+        .exclude(status='END')
+        .update(status='END', result=result, end_time=timezone.now(), **clock_fields)
+    )
+    if updated:
+        match = Match.objects.select_related('player_white', 'player_black').get(id=match_id)
+        match.compact()
+        publish_lobby('ended', match)
+        match_ended.send(sender=Match, match=match)
+    return bool(updated)
+
+
+class ClockWheel:
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, game):
+        """(Re)arm flag-fall detection for ``game``'s current position."""
+        clock = game.clock
+        if clock is None or game.is_over:
+            return
+        deadline = clock.deadline()
+        if deadline is None:
+            return
+        entry = (deadline, next(self._counter), game, game.ply)
+        heapq.heappush(self._heap, entry)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        elif self._heap[0] is entry:
+            self._wakeup.set()
+
+    async def _run(self):
+        channel_layer = get_channel_layer()
+        while self._heap:
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, game, ply = heapq.heappop(self._heap)
+            if game.is_over or game.ply != ply:
+                # Superseded by a later move, or the game already ended.
+                continue
+            try:
+                async with game.lock:
+                    if game.ply != ply:
+                        continue
+                    payload = await end_on_time(game)
+                if payload:
+                    await group_broadcast(channel_layer, f'match_{game.match_id}', payload)
+            except Exception:
+                # One game's failure must not stop flag-fall for the others.
+                logger.exception('Flag-fall handling failed for match %s', game.match_id)
+                if not game.is_over:
+                    heapq.heappush(self._heap, (time.time() + RETRY_SECONDS, next(self._counter), game, ply))
+
+
+wheel = ClockWheel()
@@ -0,0 +1,74 @@
+"""
+Compact move encoding for finished games.
+
+Each half-move is packed into 16 bits::
+
+    bits 0-5    from square (0-63)
+    bits 6-11   to square (0-63)
+    bits 12-14  promotion piece type (0 = none, 2-5 = N, B, R, Q)
+
+A game is stored as the little-endian sequence of those words, and SAN and
+FEN are rebuilt on demand by replaying the moves from the initial position.
+
+Positions are identified by their 64-bit Polyglot Zobrist key.
+"""
+import struct
+
+import chess
+import chess.polyglot
+
+STARTING_FEN = chess.STARTING_FEN
+
+
+def encode_move(move):
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(word):
+    promotion = (word >> 12) & 0x7
+    return chess.Move(word & 0x3F, (word >> 6) & 0x3F, promotion or None)
+
+
+def pack_moves(moves):
+    """Pack an iterable of ``chess.Move`` or UCI strings into bytes."""
+    words = [
+        encode_move(chess.Move.from_uci(move) if isinstance(move, str) else move)
+        for move in moves
+    ]
+    return struct.pack(f'<{len(words)}H', *words)
+
+
+def unpack_moves(data):
+    data = bytes(data)
+    count = len(data) // 2
+    return [decode_move(word) for word in struct.unpack(f'<{count}H', data)]
+
+
+def position_key(board):
+    return chess.polyglot.zobrist_hash(board)
+
+
+def signed_key(key):
+    """Zobrist keys are unsigned 64-bit; the database column is signed."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def unsigned_key(key):
+    return key + (1 << 64) if key < 0 else key
+
+
+def replay(data, fen=STARTING_FEN):
+    """Rebuild full history entries (SAN, UCI, squares, FEN) from packed moves."""
+    board = chess.Board(fen)
+    history = []
+    for move in unpack_moves(data):
+        san = board.san(move)
+        board.push(move)
+        history.append({
+            'san': san,
+            'uci': move.uci(),
+            'from': chess.square_name(move.from_square),
+            'to': chess.square_name(move.to_square),
+            'fen': board.fen(),
+        })
+    return history
@@ -0,0 +1,147 @@
+"""
+Position analysis off the event loop.
+
+After every move the new position is analysed once: its legal-move map
+(shipped to clients) and whether it is checkmate, stalemate or dead. That
+is the only move-generation work per ply, so it runs on a dedicated
+bounded pool rather than on the event loop or on the thread-sensitive
+executor that serializes the ORM.
+
+``MATCH_CHESS_EXECUTOR`` selects the pool:
+
+    'thread'   a ThreadPoolExecutor (default)
+    'process'  a ProcessPoolExecutor; sidesteps the GIL on multi-core hosts
+    'inline'   no pool, analysis runs on the calling thread
+
+Reports are memoized per Zobrist key in an LRU, since openings and common
+endgames recur across games. ``position_report`` only takes a FEN, so it
+pickles cheaply for the process pool.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import chess
+from django.conf import settings
+
+EXECUTOR_KINDS = ('thread', 'process', 'inline')
+
+
+def position_report(fen):
+    """Legal moves of ``fen`` as ``{from: [to, ...]}`` plus its terminal flags."""
+    board = chess.Board(fen)
+    moves = {}
+    for move in board.generate_legal_moves():
+        targets = moves.setdefault(chess.square_name(move.from_square), [])
+        target = chess.square_name(move.to_square)
+        # Promotions to different pieces share a target square.
+        if not targets or targets[-1] != target:
+            targets.append(target)
+    check = board.is_check()
+    return {
+        'legal_moves': moves,
+        'checkmate': check and not moves,
+        'stalemate': not check and not moves,
+        'insufficient_material': board.is_insufficient_material(),
+    }
+
+
+class PositionCache:
+    """LRU of position reports keyed by Zobrist key; reports are read-only."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        # HTTP views read it from worker threads.
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None:
+                self._entries.move_to_end(key)
+            return report
+
+    def put(self, key, report):
+        with self._lock:
+            self._entries[key] = report
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ChessPool:
+    def __init__(self, kind, workers):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f'MATCH_CHESS_EXECUTOR must be one of {EXECUTOR_KINDS}, not {kind!r}')
+        self.kind = kind
+        self.workers = workers
+        self._executor = None
+        # Bounds queued work so a burst of moves applies backpressure to
+        # the consumers instead of growing the executor's queue.
+        self._slots = None
+        self._loop = None
+
+    def _start(self):
+        if self.kind == 'thread':
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='chess')
+        elif self.kind == 'process':
+            self._executor = ProcessPoolExecutor(self.workers)
+
+    async def run(self, func, *args):
+        if self.kind == 'inline':
+            return func(*args)
+        if self._executor is None:
+            self._start()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.workers * 4)
+        async with self._slots:
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+cache = PositionCache(getattr(settings, 'MATCH_POSITION_CACHE_SIZE', 4096))
+pool = ChessPool(
+    getattr(settings, 'MATCH_CHESS_EXECUTOR', 'thread'),
+    getattr(settings, 'MATCH_CHESS_WORKERS', min(4, os.cpu_count() or 1)),
+)
+
+
+def configure(kind, workers=None):
+    """Swap the pool, e.g. from a benchmark; also empties the cache."""
+    global pool
+    pool.shutdown()
+    pool = ChessPool(kind, workers or pool.workers)
+    cache.clear()
+
+
+def analyse(fen, key):
+    """Report for the position ``fen`` with Zobrist ``key``, computed inline on a miss."""
+    report = cache.get(key)
+    if report is None:
+        report = position_report(fen)
+        cache.put(key, report)
+    return report
+
+
+async def analyse_async(fen, key):
+    """Like :func:`analyse`, but a miss is computed on the chess pool."""
+    report = cache.get(key)
+    if report is None:
+        report = await pool.run(position_report, fen)
+        cache.put(key, report)
+    return report
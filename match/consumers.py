@@ -1,89 +1,150 @@
 import json
+import time
+from urllib.parse import parse_qs
+import chess
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
+from django.utils import timezone
+from IIITChessClub.metrics import Gauge, ws_stages
+from .clock import GameClock, end_on_time, wheel
+from .codec import position_key
+from .compute import analyse_async
+from .engine import commit_move, compact_history, games, reload_game
+from .frames import encode, group_broadcast
+from .lobby import GROUP as LOBBY_GROUP, lobby, publish as publish_lobby
+from .matchmaking import TIME_CONTROLS, Seek, matchmaker, player_rating
 from .models import Match
-import chess
-from django.db import transaction
+from .signals import match_ended
+from .presence import presence
+
+Gauge('chessclub_active_games', 'Games held in the live registry.', lambda: len(games))
+Gauge('chessclub_match_sockets', 'Open match WebSockets.', games.socket_count)
+Gauge('chessclub_match_spectators', 'Open match WebSockets held by spectators.', games.spectator_count)
+Gauge('chessclub_lobby_sockets', 'Open lobby WebSockets.', lambda: lobby.subscribers)
+Gauge('chessclub_open_seeks', 'Players waiting in the matchmaking queue.', lambda: len(matchmaker))
 
 @database_sync_to_async
-def get_match_state(match_id):
+def load_match_state(match_id):
+    """
+    The game_state fields except legal_moves, plus the ``(fen, key)`` to
+    analyse for them, None once the game is over.
+    """
     match = (
         Match.objects
         .select_related("player_white", "player_black")
         .get(id=match_id)
     )
 
+    game = games.get(match_id)
+    if game is not None:
+        fen, history, ply = game.fen, game.history, game.ply
+        clock = game.clock
+        position = None if game.is_over else (fen, game.position_key)
+    else:
+        fen, history, ply = match.current_fen, match.move_history, match.ply
+        clock = GameClock.from_match(match, 'white' if ' w ' in fen else 'black')
+        position = None if match.status == 'END' else (fen, position_key(chess.Board(fen)))
+
     return {
-        "fen": match.current_fen,
-        "move_history": match.move_history,
+        "fen": fen,
+        "move_history": compact_history(history),
         "status": match.status,
         "result": match.result,
+        "ply": ply,
+        "clock": clock.to_dict() if clock else None,
         "white_player": match.player_white.username if match.player_white else None,
         "black_player": match.player_black.username if match.player_black else None,
-        "white_connected": match.white_connected,
-        "black_connected": match.black_connected,
-    }
+        "white_connected": presence.is_connected(match_id, 'white'),
+        "black_connected": presence.is_connected(match_id, 'black'),
+    }, position
+
+
+async def analyse_legal_moves(position):
+    """Legal moves for a ``(fen, key)`` position, analysed on the chess pool on a miss."""
+    if position is None:
+        return {}
+    report = await analyse_async(*position)
+    return report['legal_moves']
+
+
+async def get_match_state(match_id):
+    state, position = await load_match_state(match_id)
+    state["legal_moves"] = await analyse_legal_moves(position)
+    return state
 
 
 class MatchConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.match_id = self.scope['url_route']['kwargs']['match_id']
-        self.room_group_name = f'match_{self.match_id}'
-        self.user = self.scope.get('user')
+        with ws_stages.time(stage='connect'):
+            self.match_id = self.scope['url_route']['kwargs']['match_id']
+            self.room_group_name = f'match_{self.match_id}'
+            self.user = self.scope.get('user')
         
         
-        self.match = await self.get_match()
-        if not self.match:
-            await self.close()
-            return
+            self.game = await games.acquire(self.match_id)
+            if not self.game:
+                await self.close()
+                return
         
         
-        if not self.user or not self.user.is_authenticated:
-            self.player_color = 'spectator'
-        else:
-            self.player_color = await self.assign_player()
-            if not self.player_color:
-                self.player_color = 'spectator'
+            with ws_stages.time(stage='auth'):
+                if not self.user or not self.user.is_authenticated:
+                    self.player_color = 'spectator'
+                else:
+                    with ws_stages.time(stage='assign_player'):
+                        self.player_color = await self.assign_player()
+                    if not self.player_color:
+                        self.player_color = 'spectator'
+            if self.player_color == 'spectator':
+                self.game.spectators += 1
 
         
         
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+            await self.channel_layer.group_add(
+                self.room_group_name,
+                self.channel_name
+            )
         
-        await self.accept()
+            await self.accept()
         
         
-        if self.player_color in ("white", "black"):
-            await self.update_connection_status(True)
+            joined = False
+            if self.player_color in ("white", "black"):
+                presence.ensure_sweeper()
+                joined = await self.update_connection_status(True)
         
-        await self.send_game_state()
+            # Reconnecting clients pass the last ply they saw and only get
+            # what they missed.
+            query = parse_qs(self.scope.get('query_string', b'').decode())
+            await self.send_sync(query.get('since', [None])[0])
         
         
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'player_connected',
-                'color': self.player_color,
-                'username': self.user.username if self.user.is_authenticated else 'Anonymous'
-            }
-        )
+            if joined:
+                await self.broadcast(
+                    {
+                        'type': 'player_connected',
+                        'color': self.player_color,
+                        'username': self.user.username
+                    }
+                )
 
     async def disconnect(self, close_code):
+        if not getattr(self, 'game', None):
+            return
+        if self.player_color == 'spectator':
+            self.game.spectators -= 1
+        games.release(self.match_id)
         
-        await self.update_connection_status(False)
-        
-        
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'player_disconnected',
-                'color': self.player_color,
-                'username': self.user.username if self.user.is_authenticated else 'Anonymous'
-            }
-        )
+        if self.player_color in ("white", "black"):
+            if await self.update_connection_status(False):
+                await self.broadcast(
+                    {
+                        'type': 'player_disconnected',
+                        'color': self.player_color,
+                        'username': self.user.username
+                    }
+                )
         
         
         await self.channel_layer.group_discard(
@@ -96,7 +157,12 @@ class MatchConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get('type')
             
-            if message_type == 'move':
+            if self.player_color in ("white", "black"):
+                await self.refresh_presence()
+            
+            if message_type == 'heartbeat':
+                return
+            elif message_type == 'move':
                 await self.handle_move(data)
             elif message_type == 'offer_draw':
                 await self.handle_draw_offer()
@@ -105,7 +171,7 @@ class MatchConsumer(AsyncWebsocketConsumer):
             elif message_type == 'resign':
                 await self.handle_resign()
             elif message_type == 'request_sync':
-                await self.send_game_state()
+                await self.send_sync(data.get('since'))
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -118,10 +184,6 @@ class MatchConsumer(AsyncWebsocketConsumer):
         move_to = data.get('to')
         promotion = data.get('promotion')
         
-        
-        match = await self.get_match()
-        current_turn = 'white' if 'w' in match.current_fen.split()[1] else 'black'
-        
         if self.player_color not in ("white", "black"):
             await self.send(json.dumps({
                 "type": "error",
@@ -129,50 +191,126 @@ class MatchConsumer(AsyncWebsocketConsumer):
             }))
             return
 
-        if self.player_color != current_turn:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Not your turn'
-            }))
-            return
-        
-        
-        is_valid, new_fen, move_uci = await self.validate_move(
-            match.current_fen, move_from, move_to, promotion
-        )
-        
-        if not is_valid:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Invalid move'
-            }))
-            return
-        
-        
-        await self.save_move(move_uci, move_from, move_to, new_fen)
-        
-        
-        game_status = await self.check_game_end(new_fen)
-        
+        game = self.game
+        async with game.lock:
+            with ws_stages.time(stage='validate'):
+                expected_ply = data.get('ply', game.ply)
+                if isinstance(expected_ply, int) and expected_ply > game.ply:
+                    # The client saw moves committed through another worker.
+                    await reload_game(game)
+
+                if game.is_over:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'Game is over'
+                    }))
+                    return
+
+                if expected_ply != game.ply:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'Stale move'
+                    }))
+                    return
+
+                if self.player_color != game.turn:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'Not your turn'
+                    }))
+                    return
+            
+                move = game.parse_move(move_from, move_to, promotion)
+                if move is None:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'Invalid move'
+                    }))
+                    return
+            
+            now = time.time()
+            if game.clock is not None and game.clock.flagged(now):
+                # The mover ran out before this move reached us.
+                timed_out = await end_on_time(game)
+                if timed_out:
+                    await self.broadcast(timed_out)
+                else:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'Stale move'
+                    }))
+                return
+            
+            entry = game.push(move, now)
+            try:
+                with ws_stages.time(stage='analyse'):
+                    report = await analyse_async(game.fen, game.position_key)
+            except Exception:
+                game.pop()
+                raise
+            game_status = game.outcome(report)
+            status_update = None
+            if game_status['game_over']:
+                if game.clock is not None:
+                    game.clock.stop(now)
+                status_update = {
+                    'status': 'END',
+                    'result': game_status['result'],
+                    'end_time': timezone.now(),
+                }
+            
+            with ws_stages.time(stage='persist'):
+                committed = await self.commit_move(expected_ply, status_update)
+            if not committed:
+                game.pop()
+                await reload_game(game)
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'message': 'Stale move'
+                }))
+                await self.send_game_state()
+                return
+            
+            game.draw_offer = None
+            if game_status['game_over']:
+                game.finish(game_status['result'])
+            else:
+                wheel.schedule(game)
+            legal_moves = {} if game_status['game_over'] else report['legal_moves']
         
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        await self.broadcast(
             {
-                'type': 'send_move',
+                'type': 'move',
                 'move': {
                     'from': move_from,
                     'to': move_to,
-                    'uci': move_uci,
+                    'uci': entry['uci'],
                     'promotion': promotion
                 },
-                'fen': new_fen,
-                'game_status': game_status
+                'fen': entry['fen'],
+                'ply': expected_ply + 1,
+                'clock': game.clock.to_dict(now) if game.clock else None,
+                'game_status': game_status,
+                'legal_moves': legal_moves
             }
         )
+        
+        if game_status['game_over']:
+            await self.compact_match()
 
     async def handle_draw_offer(self):
-        await self.channel_layer.group_send(
-            self.room_group_name,
+        if not await self.require_player():
+            return
+        game = self.game
+        async with game.lock:
+            if game.is_over:
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'message': 'Game is over'
+                }))
+                return
+            game.offer_draw(self.player_color)
+        await self.broadcast(
             {
                 'type': 'draw_offered',
                 'by': self.player_color
@@ -180,118 +318,83 @@ class MatchConsumer(AsyncWebsocketConsumer):
         )
 
     async def handle_draw_response(self, accept):
+        if not await self.require_player():
+            return
         if accept:
-            await self.end_game('1/2-1/2', 'Draw by agreement')
-        else:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'draw_declined',
-                    'by': self.player_color
-                }
-            )
+            await self.end_game('1/2-1/2', 'Draw by agreement', accepting_draw=True)
+            return
+        game = self.game
+        async with game.lock:
+            if not game.draw_offered_to(self.player_color):
+                await self.send_no_draw_offer()
+                return
+            game.draw_offer = None
+        await self.broadcast(
+            {
+                'type': 'draw_declined',
+                'by': self.player_color
+            }
+        )
+
+    async def send_no_draw_offer(self):
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'message': 'No draw offer to answer'
+        }))
 
     async def handle_resign(self):
+        if not await self.require_player():
+            return
         result = '0-1' if self.player_color == 'white' else '1-0'
         winner = 'Black' if self.player_color == 'white' else 'White'
         await self.end_game(result, f'{winner} wins by resignation')
 
-    async def end_game(self, result, reason):
-        await self.save_game_result(result)
-        
-        await self.channel_layer.group_send(
-            self.room_group_name,
+    async def require_player(self):
+        if self.player_color in ("white", "black"):
+            return True
+        await self.send(text_data=json.dumps({
+            'type': 'error',
+            'message': 'Only players can do that'
+        }))
+        return False
+
+    async def end_game(self, result, reason, accepting_draw=False):
+        game = self.game
+        async with game.lock:
+            if accepting_draw and not game.draw_offered_to(self.player_color):
+                await self.send_no_draw_offer()
+                return
+            if game.is_over or not await self.save_game_result(result):
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'message': 'Game is over'
+                }))
+                return
+            game.finish(result)
+        
+        await self.broadcast(
             {
                 'type': 'game_ended',
                 'result': result,
-                'reason': reason
+                'reason': reason,
+                'clock': game.clock.to_dict() if game.clock else None,
             }
         )
 
     
-    async def send_move(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'move',
-            'move': event['move'],
-            'fen': event['fen'],
-            'game_status': event.get('game_status')
-        }))
-
-    async def player_connected(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'player_connected',
-            'color': event['color'],
-            'username': event['username']
-        }))
-
-    async def player_disconnected(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'player_disconnected',
-            'color': event['color'],
-            'username': event['username']
-        }))
-
-    async def draw_offered(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'draw_offered',
-            'by': event['by']
-        }))
-
-    async def draw_declined(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'draw_declined',
-            'by': event['by']
-        }))
-
-    async def game_ended(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'game_ended',
-            'result': event['result'],
-            'reason': event['reason']
-        }))
+    async def broadcast(self, payload):
+        with ws_stages.time(stage='group_send'):
+            await group_broadcast(self.channel_layer, self.room_group_name, payload)
 
-    
-    @database_sync_to_async
-    def get_match(self):
-        try:
-            return Match.objects.get(id=self.match_id)
-        except Match.DoesNotExist:
-            return None
+    async def send_frame(self, event):
+        await self.send(text_data=event['frame'])
 
-    # @database_sync_to_async
-    # def assign_player(self):
-    #     match = Match.objects.get(id=self.match_id)
-        
-    #     if not self.user.is_authenticated:
-    #         return None
-        
-        
-    #     if match.player_white == self.user:
-    #         return 'white'
-    #     elif match.player_black == self.user:
-    #         return 'black'
-        
-        
-    #     if match.status == 'WAIT':
-    #         if not match.player_white:
-    #             match.player_white = self.user
-    #             match.save()
-    #             return 'white'
-    #         elif not match.player_black:
-    #             match.player_black = self.user
-    #             match.status = 'LIVE'
-    #             match.save()
-    #             return 'black'
-        
-        
-    #     return None
     @database_sync_to_async
     def assign_player(self):
         if not self.user.is_authenticated:
             return None
 
-        #with transaction.atomic():
-        match = Match.objects.get(id=self.match_id) #match = Match.objects.select_for_update().get(id=self.match_id)
+        match = Match.objects.get(id=self.match_id)
 
         if match.player_white == self.user:
             return 'white'
@@ -302,133 +405,62 @@ class MatchConsumer(AsyncWebsocketConsumer):
             if not match.player_white:
                 match.player_white = self.user
                 match.save()
+                publish_lobby('joined', match)
                 return 'white'
             elif not match.player_black:
                 match.player_black = self.user
                 match.status = 'LIVE'
                 match.save()
+                publish_lobby('started', match)
                 return 'black'
 
         return None
 
-    # @database_sync_to_async
-    # def update_connection_status(self, connected):
-    #     match = Match.objects.get(id=self.match_id)
-        
-    #     if self.player_color == 'white':
-    #         match.white_connected = connected
-    #     elif self.player_color == 'black':
-    #         match.black_connected = connected
-        
-    #     match.save()
-    @database_sync_to_async
-    def update_connection_status(self, connected):
-        #with transaction.atomic():
-        match = Match.objects.get(id=self.match_id) #match = Match.objects.select_for_update().get(id=self.match_id)
-        if self.player_color == 'white':
-            match.white_connected = connected
-        elif self.player_color == 'black':
-            match.black_connected = connected
-        match.save()
+    async def refresh_presence(self):
+        rejoined = presence.heartbeat(
+            self.match_id, self.player_color, self.channel_name, self.user.username
+        )
+        if rejoined:
+            await self.broadcast(
+                {
+                    'type': 'player_connected',
+                    'color': self.player_color,
+                    'username': self.user.username
+                }
+            )
 
-    @database_sync_to_async
-    def validate_move(self, fen, move_from, move_to, promotion):
-        try:
-            board = chess.Board(fen)
-            
-            
-            move_uci = move_from + move_to + (promotion if promotion else '')
-            move = chess.Move.from_uci(move_uci)
-            
-            if move in board.legal_moves:
-                board.push(move)
-                new_fen = board.fen()
-                move_uci = board.uci(move)
-                return True, new_fen, move_uci
-            else:
-                return False, None, None
-                
-        except Exception as e:
-            print(f"Move validation error: {e}")
-            return False, None, None
+    async def update_connection_status(self, connected):
+        if connected:
+            return presence.join(
+                self.match_id, self.player_color, self.channel_name, self.user.username
+            )
+        return presence.leave(self.match_id, self.player_color, self.channel_name)
 
     @database_sync_to_async
-    def save_move(self, move_uci, move_from, move_to, new_fen):
-        match = Match.objects.get(id=self.match_id)
-        match.add_move(move_uci, move_from, move_to, new_fen)
+    def commit_move(self, expected_ply, status_update):
+        return commit_move(self.game, expected_ply, status_update)
 
     @database_sync_to_async
-    def check_game_end(self, fen):
-        try:
-            board = chess.Board(fen)
-            
-            if board.is_checkmate():
-                winner = 'Black' if board.turn == chess.WHITE else 'White'
-                result = '0-1' if board.turn == chess.WHITE else '1-0'
-                Match.objects.filter(id=self.match_id).update(
-                    status='END',
-                    result=result
-                )
-                return {
-                    'game_over': True,
-                    'result': result,
-                    'reason': f'{winner} wins by checkmate'
-                }
-            elif board.is_stalemate():
-                Match.objects.filter(id=self.match_id).update(
-                    status='END',
-                    result='1/2-1/2'
-                )
-                return {
-                    'game_over': True,
-                    'result': '1/2-1/2',
-                    'reason': 'Draw by stalemate'
-                }
-            elif board.is_insufficient_material():
-                Match.objects.filter(id=self.match_id).update(
-                    status='END',
-                    result='1/2-1/2'
-                )
-                return {
-                    'game_over': True,
-                    'result': '1/2-1/2',
-                    'reason': 'Draw by insufficient material'
-                }
-            elif board.is_fifty_moves():
-                Match.objects.filter(id=self.match_id).update(
-                    status='END',
-                    result='1/2-1/2'
-                )
-                return {
-                    'game_over': True,
-                    'result': '1/2-1/2',
-                    'reason': 'Draw by fifty-move rule'
-                }
-            elif board.is_repetition():
-                Match.objects.filter(id=self.match_id).update(
-                    status='END',
-                    result='1/2-1/2'
-                )
-                return {
-                    'game_over': True,
-                    'result': '1/2-1/2',
-                    'reason': 'Draw by repetition'
-                }
-            
-            return {'game_over': False}
-            
-        except Exception as e:
-            print(f"Game end check error: {e}")
-            return {'game_over': False}
+    def compact_match(self):
+        match = Match.objects.select_related('player_white', 'player_black').get(id=self.match_id)
+        match.compact()
+        publish_lobby('ended', match)
+        match_ended.send(sender=Match, match=match)
 
     @database_sync_to_async
     def save_game_result(self, result):
-        from django.utils import timezone
-        Match.objects.filter(id=self.match_id).update(
+        """End the game as ``result`` if it is still live; False if it already ended."""
+        updated = Match.objects.filter(id=self.match_id, status='LIVE').update(
             status='END',
             result=result,
             end_time=timezone.now()
         )
+        if updated:
+            match = Match.objects.select_related('player_white', 'player_black').get(id=self.match_id)
+            match.compact()
+            publish_lobby('ended', match)
+            match_ended.send(sender=Match, match=match)
+        return bool(updated)
 
     async def send_game_state(self):
         state = await get_match_state(self.match_id)
@@ -438,3 +470,122 @@ class MatchConsumer(AsyncWebsocketConsumer):
             "player_color": self.player_color,
             **state
         }))
+
+    async def send_sync(self, since):
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            since = None
+
+        game = self.game
+        async with game.lock:
+            if since is None or not game.can_sync_from(since):
+                delta = None
+            else:
+                delta = {
+                    "type": "sync",
+                    "since": since,
+                    "ply": game.ply,
+                    "fen": game.fen,
+                    "moves": compact_history(game.history, since),
+                    "clock": game.clock.to_dict() if game.clock else None,
+                    "game_over": game.is_over,
+                    "result": game.result,
+                }
+                position = None if game.is_over else (game.fen, game.position_key)
+
+        if delta is None:
+            await self.send_game_state()
+        else:
+            delta["legal_moves"] = await analyse_legal_moves(position)
+            await self.send(text_data=encode(delta))
+
+
+class LobbyConsumer(AsyncWebsocketConsumer):
+    """Lobby snapshot on connect, then a diff per match change."""
+
+    async def connect(self):
+        # Join first: anything published while the snapshot loads is
+        # either in it or delivered after it.
+        await self.channel_layer.group_add(LOBBY_GROUP, self.channel_name)
+        try:
+            await lobby.subscribe()
+        except Exception:
+            await self.channel_layer.group_discard(LOBBY_GROUP, self.channel_name)
+            raise
+        self.subscribed = True
+        await self.accept()
+        await self.send(text_data=encode(lobby.snapshot()))
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'subscribed', False):
+            self.subscribed = False
+            lobby.unsubscribe()
+        await self.channel_layer.group_discard(LOBBY_GROUP, self.channel_name)
+
+    async def receive(self, text_data):
+        # Read-only feed.
+        pass
+
+    async def lobby_event(self, event):
+        lobby.apply(event['event'], event['match'])
+        await self.send(text_data=event['frame'])
+
+
+class SeekConsumer(AsyncWebsocketConsumer):
+    """Matchmaking: ``seek`` at a time control, ``cancel``, then get ``paired``."""
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.seek = None
+        if not self.user or not self.user.is_authenticated:
+            await self.close()
+            return
+        await self.accept()
+        await self.send(text_data=encode({
+            'type': 'time_controls',
+            'time_controls': [list(control) for control in TIME_CONTROLS],
+        }))
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'seek', None) is not None:
+            matchmaker.remove(self.seek)
+            self.seek = None
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+            kind = data.get('type')
+            if kind == 'seek':
+                control = (int(data['base_minutes']), int(data['increment']))
+                if control not in matchmaker.pools:
+                    raise ValueError('Unknown time control')
+                if self.seek is not None:
+                    matchmaker.remove(self.seek)
+                rating = await player_rating(self.user.id)
+                self.seek = Seek(self.user.id, self.user.username, rating, control, self.channel_name)
+                await self.send(text_data=encode({
+                    'type': 'seeking',
+                    'time_control': list(control),
+                    'rating': rating,
+                }))
+                await matchmaker.submit(self.seek)
+            elif kind == 'cancel':
+                if self.seek is not None and matchmaker.remove(self.seek):
+                    await self.send(text_data=encode({'type': 'seek_cancelled', 'reason': 'Cancelled'}))
+                self.seek = None
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid JSON'
+            }))
+        except (ValueError, KeyError, TypeError) as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': str(e)
+            }))
+
+    async def seek_message(self, event):
+        if event['payload']['type'] in ('paired', 'seek_cancelled', 'seek_failed'):
+            self.seek = None
+        await self.send(text_data=encode(event['payload']))
@@ -0,0 +1,388 @@
+"""
+Per-process registry of live games.
+
+Each active match keeps one ``chess.Board`` (with its full move stack) in
+memory, loaded from the database the first time a socket connects to it.
+Moves are validated and pushed against that board, so the consumer only
+touches the database to persist the result.
+
+Persistence is optimistic: every committed move is a conditional
+``UPDATE ... WHERE ply = <expected ply>`` plus one appended MatchMove row.
+If another worker (or the HTTP API) changed the match in the meantime the
+update matches no rows and the move is rolled back instead of silently
+overwriting the other write.
+
+Repetition is tracked with a Zobrist key -> count table per game, updated
+on every push, so draw detection costs the same at ply 300 as at ply 3.
+The table only holds positions since the last capture or pawn move, since
+no earlier position can recur after one.
+
+Checkmate, stalemate and the legal-move map shipped to clients come from
+:mod:`match.compute`, which analyses each new position once.
+"""
+import asyncio
+import time
+from collections import Counter
+
+import chess
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .clock import GameClock, wheel
+from .codec import position_key, signed_key, unsigned_key
+from .compute import analyse
+from .models import Match, MatchMove
+
+GAME_IDLE_SECONDS = getattr(settings, 'MATCH_GAME_IDLE_SECONDS', 300)
+# Reconnecting clients further behind than this get a snapshot instead of
+# a delta.
+SYNC_MAX_MOVES = getattr(settings, 'MATCH_SYNC_MAX_MOVES', 60)
+
+
+def position_counts(keys, halfmove_clock):
+    """
+    Repetition table for a game whose positions had ``keys``, oldest first.
+
+    Only the positions since the last capture or pawn move can recur, and
+    the halfmove clock says how many plies ago that was.
+    """
+    return Counter(keys[-(halfmove_clock + 1):])
+
+
+def compact_history(history, start=0):
+    """History entries after ply ``start`` without their per-move FENs."""
+    return [
+        {'ply': ply, 'san': entry['san'], 'uci': entry['uci']}
+        for ply, entry in enumerate(history[start:], start=start + 1)
+    ]
+
+
+class LiveGame:
+    def __init__(self, match_id, board, history, status, result, ply, clock=None, positions=None):
+        self.match_id = match_id
+        self.board = board
+        self.position_key = position_key(board)
+        if positions is None:
+            positions = Counter({self.position_key: 1})
+        self.positions = positions
+        self._position_undo = []
+        self.history = history
+        self.ply = ply
+        self.clock = clock
+        self._clock_undo = []
+        self.status = status
+        self.result = result
+        # (colour, ply) of a standing draw offer; any committed move ends it.
+        self.draw_offer = None
+        self.lock = asyncio.Lock()
+        self.sockets = 0
+        self.spectators = 0
+        self.last_active = time.monotonic()
+
+    @classmethod
+    def from_match(cls, match):
+        history = match.move_history
+        board = chess.Board()
+        keys = [position_key(board)]
+        try:
+            for entry in history:
+                board.push_uci(entry['uci'])
+                keys.append(position_key(board))
+        except ValueError:
+            board = None
+        if board is None or board.fen() != match.current_fen:
+            # History edited by hand; fall back to the stored position
+            # without a move stack, and the position keys saved per move.
+            board = chess.Board(match.current_fen)
+            keys = [position_key(chess.Board())] + [
+                key for key in match.moves.values_list('zobrist', flat=True)
+                if key is not None
+            ]
+            keys = [unsigned_key(key) for key in keys]
+            if not keys or keys[-1] != position_key(board):
+                keys = [position_key(board)]
+        turn = 'white' if board.turn == chess.WHITE else 'black'
+        return cls(
+            match.id, board, list(history), match.status, match.result, match.ply,
+            GameClock.from_match(match, turn),
+            position_counts(keys, board.halfmove_clock),
+        )
+
+    @property
+    def fen(self):
+        return self.board.fen()
+
+    @property
+    def turn(self):
+        return 'white' if self.board.turn == chess.WHITE else 'black'
+
+    @property
+    def is_over(self):
+        return self.status == 'END'
+
+    def report(self):
+        return analyse(self.fen, self.position_key)
+
+    @property
+    def legal_moves(self):
+        if self.is_over:
+            return {}
+        return self.report()['legal_moves']
+
+    def can_sync_from(self, ply):
+        return 0 <= self.ply - ply <= SYNC_MAX_MOVES and ply <= len(self.history)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def parse_move(self, move_from, move_to, promotion=None):
+        """Return the legal ``chess.Move`` for the given squares, or None."""
+        try:
+            move = chess.Move.from_uci(move_from + move_to + (promotion or ''))
+        except (TypeError, ValueError):
+            return None
+        if move not in self.board.legal_moves:
+            return None
+        return move
+
+    def push(self, move, now=None):
+        """Play ``move`` on the live board and return its history entry."""
+        if self.clock is not None:
+            self._clock_undo.append(self.clock.snapshot())
+            self.clock.press(self.turn, time.time() if now is None else now)
+        san = self.board.san(move)
+        self.board.push(move)
+        self._count_position()
+        entry = {
+            'san': san,
+            'uci': move.uci(),
+            'from': chess.square_name(move.from_square),
+            'to': chess.square_name(move.to_square),
+            'fen': self.board.fen(),
+        }
+        self.history.append(entry)
+        self.ply += 1
+        self.touch()
+        return entry
+
+    def _count_position(self):
+        key = position_key(self.board)
+        if self.board.halfmove_clock == 0:
+            # Capture or pawn move: nothing before it can repeat.
+            self._position_undo.append((self.position_key, self.positions))
+            self.positions = Counter()
+        else:
+            self._position_undo.append((self.position_key, None))
+        self.positions[key] += 1
+        self.position_key = key
+
+    def pop(self):
+        self.positions[self.position_key] -= 1
+        self.position_key, positions = self._position_undo.pop()
+        if positions is not None:
+            self.positions = positions
+        self.board.pop()
+        self.history.pop()
+        self.ply -= 1
+        if self.clock is not None:
+            self.clock.restore(self._clock_undo.pop())
+
+    def outcome(self, report=None):
+        """
+        Game-end status for the current position, in broadcast form.
+
+        ``report`` is this position's analysis from :mod:`match.compute`,
+        computed inline if not given.
+        """
+        board = self.board
+        if report is None:
+            report = self.report()
+        if report['checkmate']:
+            winner = 'Black' if board.turn == chess.WHITE else 'White'
+            result = '0-1' if board.turn == chess.WHITE else '1-0'
+            return {
+                'game_over': True,
+                'result': result,
+                'reason': f'{winner} wins by checkmate'
+            }
+        if report['stalemate']:
+            reason = 'Draw by stalemate'
+        elif report['insufficient_material']:
+            reason = 'Draw by insufficient material'
+        elif board.halfmove_clock >= 100:
+            reason = 'Draw by fifty-move rule'
+        elif self.positions[self.position_key] >= 3:
+            reason = 'Draw by repetition'
+        else:
+            return {'game_over': False}
+        return {
+            'game_over': True,
+            'result': '1/2-1/2',
+            'reason': reason
+        }
+
+    def offer_draw(self, color):
+        self.draw_offer = (color, self.ply)
+
+    def draw_offered_to(self, color):
+        """True if ``color``'s opponent offered a draw in the current position."""
+        return (
+            self.draw_offer is not None
+            and self.draw_offer[0] != color
+            and self.draw_offer[1] == self.ply
+        )
+
+    def finish(self, result):
+        self.status = 'END'
+        self.result = result
+        if self.clock is not None:
+            self.clock.stop(time.time())
+
+    def refresh_from(self, other):
+        self.board = other.board
+        self.position_key = other.position_key
+        self.positions = other.positions
+        self._position_undo = []
+        self.history = other.history
+        self.ply = other.ply
+        self.status = other.status
+        self.result = other.result
+        self.draw_offer = None
+        self.clock = other.clock
+        self._clock_undo = []
+        self.touch()
+
+
+class GameRegistry:
+    def __init__(self, idle_seconds=GAME_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._games = {}
+        self._loading = {}
+
+    def __contains__(self, match_id):
+        return int(match_id) in self._games
+
+    def __len__(self):
+        return len(self._games)
+
+    def get(self, match_id):
+        return self._games.get(int(match_id))
+
+    def socket_count(self):
+        return sum(game.sockets for game in self._games.values())
+
+    def spectator_count(self):
+        return sum(game.spectators for game in self._games.values())
+
+    async def acquire(self, match_id):
+        """
+        Return the live game for ``match_id``, loading it on first use.
+
+        Every successful call must be paired with :meth:`release`.
+        Returns None when the match does not exist.
+        """
+        match_id = int(match_id)
+        self.sweep()
+        game = self._games.get(match_id)
+        if game is None:
+            loading = self._loading.get(match_id)
+            if loading is None:
+                loading = asyncio.ensure_future(_load_game(match_id))
+                self._loading[match_id] = loading
+                try:
+                    game = await loading
+                finally:
+                    del self._loading[match_id]
+                if game is not None:
+                    self._games[match_id] = game
+                    wheel.schedule(game)
+            else:
+                game = await loading
+            if game is None:
+                return None
+        game.sockets += 1
+        game.touch()
+        return game
+
+    def release(self, match_id):
+        game = self._games.get(int(match_id))
+        if game is None:
+            return
+        game.sockets = max(game.sockets - 1, 0)
+        game.touch()
+        if game.is_over and not game.sockets:
+            self.evict(match_id)
+
+    def evict(self, match_id):
+        self._games.pop(int(match_id), None)
+
+    def sweep(self):
+        """Drop games nobody is connected to that have been idle too long."""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [
+            match_id for match_id, game in self._games.items()
+            if not game.sockets and game.last_active < cutoff
+        ]
+        for match_id in idle:
+            del self._games[match_id]
+
+
+@database_sync_to_async
+def _load_game(match_id):
+    try:
+        match = Match.objects.get(id=match_id)
+    except Match.DoesNotExist:
+        return None
+    return LiveGame.from_match(match)
+
+
+async def reload_game(game):
+    """Replace a stale live game's state with what is in the database."""
+    fresh = await _load_game(game.match_id)
+    if fresh is None:
+        game.finish(game.result)
+    else:
+        game.refresh_from(fresh)
+        wheel.schedule(game)
+
+
+def commit_move(game, expected_ply, status_update=None):
+    """
+    Persist the move just pushed on ``game``.
+
+    The Match row is only advanced if it is still at ``expected_ply`` and has
+    not ended; the new ply is then appended to the move table. Returns False
+    otherwise, in which case the caller must pop the move and treat the
+    in-memory game as stale.
+    """
+    entry = game.history[-1]
+    fields = {
+        'current_fen': entry['fen'],
+        'ply': expected_ply + 1,
+    }
+    if game.clock is not None:
+        fields.update(game.clock.db_fields())
+    if status_update:
+        fields.update(status_update)
+    with transaction.atomic():
+        updated = (
+            Match.objects
+            .filter(id=game.match_id, ply=expected_ply)
+            .exclude(status='END')
+            .update(**fields)
+        )
+        if not updated:
+            return False
+        MatchMove.objects.create(
+            match_id=game.match_id,
+            ply=expected_ply + 1,
+            san=entry['san'],
+            uci=entry['uci'],
+            fen=entry['fen'],
+            zobrist=signed_key(game.position_key),
+        )
+    return True
+
+
+games = GameRegistry()
@@ -0,0 +1,27 @@
+"""
+Encode-once group broadcasts.
+
+Group events carry the outbound WebSocket frame already serialized, so a
+broadcast to a board with hundreds of spectators is encoded a single time
+instead of once per socket. orjson is used when installed.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode(payload):
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload, separators=(',', ':'))
+
+
+async def group_broadcast(channel_layer, group, payload):
+    """Send ``payload`` to every socket in ``group`` via ``send_frame``."""
+    await channel_layer.group_send(group, {
+        'type': 'send_frame',
+        'frame': encode(payload),
+    })
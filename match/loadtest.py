@@ -0,0 +1,275 @@
+"""
+Load generator for MatchConsumer.
+
+Drives simultaneous games and spectators through the real consumer stack
+with channels' ``WebsocketCommunicator``, so every move goes through the
+game registry, the database commit and the group broadcast exactly as it
+would in production. Run it under the in-memory channel layer; see the
+``loadtest_match`` management command.
+"""
+import asyncio
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+
+import chess
+import chess.pgn
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import routing
+from .frames import encode
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+REPLY_TIMEOUT = 10
+
+
+def scripted_game(plies, seed):
+    """A reproducible legal game that stays unfinished for ``plies`` moves."""
+    rng = random.Random(seed)
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies:
+        candidates = list(board.legal_moves)
+        rng.shuffle(candidates)
+        for move in candidates:
+            board.push(move)
+            over = (
+                board.is_game_over()
+                or board.is_fifty_moves()
+                or board.is_repetition(2)
+            )
+            if not over:
+                moves.append(move.uci())
+                break
+            board.pop()
+        else:
+            break
+    return moves
+
+
+def pgn_games(path):
+    """UCI move lists for every game in a PGN file that starts from the initial position."""
+    scripts = []
+    with open(path, encoding='utf-8', errors='replace') as handle:
+        while True:
+            game = chess.pgn.read_game(handle)
+            if game is None:
+                break
+            if game.headers.get('FEN', chess.STARTING_FEN) != chess.STARTING_FEN:
+                continue
+            moves = [move.uci() for move in game.mainline_moves()]
+            if moves:
+                scripts.append(moves)
+    return scripts
+
+
+class QueryCounter:
+    """Counts queries on every connection opened while it is installed."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def _hook(self, sender, connection, **kwargs):
+        # Fires again whenever Django reopens the same connection.
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def _hook_thread(self):
+        for conn in connections.all():
+            self._hook(None, conn)
+
+    def _unhook_thread(self):
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+    async def install(self):
+        # Consumers run their queries on asgiref's executor thread, which
+        # has its own connections; hook those and any opened later.
+        connection_created.connect(self._hook, weak=False)
+        await database_sync_to_async(self._hook_thread)()
+
+    async def uninstall(self):
+        connection_created.disconnect(self._hook)
+        await database_sync_to_async(self._unhook_thread)()
+        self._unhook_thread()
+
+
+class Socket:
+    """A connected communicator plus a task recording when frames arrive."""
+
+    def __init__(self, application, match_id, user, stats):
+        self.match_id = match_id
+        self.comm = WebsocketCommunicator(application, f'/ws/match/{match_id}/')
+        self.comm.scope['user'] = user
+        self.stats = stats
+        self.replies = asyncio.Queue()
+        self.last_ply = 0
+        self.reader = None
+
+    async def connect(self):
+        connected, _ = await self.comm.connect(timeout=REPLY_TIMEOUT)
+        if not connected:
+            raise RuntimeError('consumer refused the connection')
+        self.reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        while True:
+            message = await self.comm.output_queue.get()
+            if message['type'] != 'websocket.send':
+                return
+            received = time.perf_counter()
+            self.stats['frames'] += 1
+            frame = loads(message['text'])
+            kind = frame.get('type')
+            if kind == 'move':
+                self.last_ply = frame['ply']
+                sent = self.stats['sent'].get((self.match_id, frame['ply']))
+                if sent is not None:
+                    self.stats['latencies'].append(received - sent)
+            if kind in ('move', 'error', 'game_ended'):
+                self.replies.put_nowait(frame)
+
+    async def close(self):
+        if self.reader is not None:
+            self.reader.cancel()
+        await self.comm.disconnect()
+
+
+class Board:
+    """The two player sockets and the spectators watching one match."""
+
+    def __init__(self, application, match_id, white, black, spectators, stats):
+        self.match_id = match_id
+        self.players = [
+            Socket(application, match_id, white, stats),
+            Socket(application, match_id, black, stats),
+        ]
+        self.sockets = self.players + [
+            Socket(application, match_id, None, stats) for _ in range(spectators)
+        ]
+        self.stats = stats
+
+    async def connect(self):
+        for socket in self.sockets:
+            await socket.connect()
+
+    async def close(self):
+        for socket in self.sockets:
+            await socket.close()
+
+    async def drain(self, ply):
+        """Wait until every socket has seen the broadcast for ``ply``."""
+        deadline = time.perf_counter() + REPLY_TIMEOUT
+        while any(socket.last_ply < ply for socket in self.sockets):
+            if time.perf_counter() > deadline:
+                self.stats['undelivered'] += sum(socket.last_ply < ply for socket in self.sockets)
+                return
+            await asyncio.sleep(0.005)
+
+    async def play(self, script, think):
+        stats = self.stats
+        played = 0
+        for ply, uci in enumerate(script):
+            mover = self.players[ply % 2]
+            stats['sent'][(self.match_id, ply + 1)] = time.perf_counter()
+            await mover.comm.send_to(text_data=encode({
+                'type': 'move',
+                'from': uci[:2],
+                'to': uci[2:4],
+                'promotion': uci[4:] or None,
+                'ply': ply,
+            }))
+            reply = await asyncio.wait_for(mover.replies.get(), REPLY_TIMEOUT)
+            if reply['type'] != 'move':
+                stats['rejected'] += 1
+                break
+            stats['moves'] += 1
+            played += 1
+            if reply['game_status'].get('game_over'):
+                break
+            if think:
+                await asyncio.sleep(think)
+        await self.drain(played)
+
+
+async def run(matches, scripts, spectators, think=0, trace_memory=False):
+    """
+    Play ``scripts`` on ``matches`` concurrently with ``spectators`` sockets
+    spread across the boards.
+
+    ``matches`` are (match_id, white_user, black_user) tuples for LIVE
+    matches with no moves. Returns a dict of throughput, latency, query and
+    memory figures. ``trace_memory`` adds the tracemalloc peak, which slows
+    the run down considerably.
+    """
+    application = URLRouter(routing.websocket_urlpatterns)
+    stats = {'sent': {}, 'latencies': [], 'frames': 0, 'moves': 0, 'rejected': 0,
+             'undelivered': 0}
+    per_game = [spectators // len(matches)] * len(matches)
+    for i in range(spectators % len(matches)):
+        per_game[i] += 1
+
+    counter = QueryCounter()
+    await counter.install()
+    if trace_memory:
+        tracemalloc.start()
+    peak = None
+    boards = [
+        Board(application, match_id, white, black, watchers, stats)
+        for (match_id, white, black), watchers in zip(matches, per_game)
+    ]
+    try:
+        await asyncio.gather(*(board.connect() for board in boards))
+        # Only the move phase counts towards queries and latency.
+        counter.count = 0
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            board.play(script, think) for board, script in zip(boards, scripts)
+        ))
+        elapsed = time.perf_counter() - start
+        queries = counter.count
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+        await asyncio.gather(*(board.close() for board in boards))
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        await counter.uninstall()
+
+    latencies = stats['latencies']
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    moves = stats['moves']
+    return {
+        'games': len(matches),
+        'spectators': spectators,
+        'moves': moves,
+        'rejected': stats['rejected'],
+        'frames': stats['frames'],
+        'undelivered': stats['undelivered'],
+        'elapsed': elapsed,
+        'moves_per_sec': moves / elapsed if elapsed else 0.0,
+        'p50_ms': cuts[49] * 1000 if cuts else 0.0,
+        'p95_ms': cuts[94] * 1000 if cuts else 0.0,
+        'p99_ms': cuts[98] * 1000 if cuts else 0.0,
+        'queries': queries,
+        'queries_per_move': queries / moves if moves else 0.0,
+        'peak_traced_kib': peak / 1024 if peak is not None else None,
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
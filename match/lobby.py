@@ -0,0 +1,188 @@
+"""
+Push feed for the match lobby.
+
+Whenever a match is created, joined, started, ended or cancelled, its
+lobby summary is sent to the ``lobby`` group once the change commits.
+Each worker keeps an in-memory read model of the lobby (every waiting and
+live match plus the latest finished ones), updated from those same group
+events, so a new subscriber gets its snapshot without touching the
+database. The model is loaded from the database when a worker gets its
+first lobby subscriber and dropped when the last one leaves, since it
+only receives events while someone is subscribed.
+
+A match's status only moves forward (WAIT, LIVE, END, or removed when
+its creator cancels), so events are applied as idempotent upserts that
+never move a match backwards; every consumer in a worker may apply the
+same event.
+"""
+import asyncio
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from .frames import encode
+from .models import Match
+
+GROUP = 'lobby'
+WAITING_LIMIT = getattr(settings, 'MATCH_LOBBY_PAGE_SIZE', 20)
+LIVE_LIMIT = 10
+RECENT_LIMIT = 10
+EVENTS = ('created', 'joined', 'started', 'ended', 'removed')
+
+_RANK = {'WAIT': 0, 'LIVE': 1, 'END': 2}
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def summary(match):
+    """What the lobby shows of ``match``; select players to avoid queries."""
+    return {
+        'id': match.id,
+        'status': match.status,
+        'result': match.result,
+        'white': match.player_white.username if match.player_white_id else None,
+        'black': match.player_black.username if match.player_black_id else None,
+        'start_time': _iso(match.start_time),
+        'end_time': _iso(match.end_time),
+    }
+
+
+def _newest(matches, field, limit=None):
+    ordered = sorted(matches, key=lambda m: (m[field] or '', m['id']), reverse=True)
+    return ordered[:limit] if limit else ordered
+
+
+class LobbyModel:
+    def __init__(self, recent_limit=RECENT_LIMIT):
+        self.recent_limit = recent_limit
+        self.subscribers = 0
+        self._open = {}
+        self._recent = {}
+        # Ids that ended or were cancelled, so a late event cannot revive them.
+        self._closed = set()
+        self._loaded = False
+        self._pending = None
+        self._lock = None
+
+    def __len__(self):
+        return len(self._open) + len(self._recent)
+
+    async def subscribe(self):
+        """Count a subscriber in, loading the model on the first one."""
+        self.subscribers += 1
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded:
+                return
+            # Events that race the load are replayed over it.
+            self._pending = []
+            try:
+                rows = await _load_rows(self.recent_limit)
+            except BaseException:
+                self._pending = None
+                self.subscribers -= 1
+                raise
+            pending, self._pending = self._pending, None
+            self._loaded = True
+            for row in rows:
+                self._upsert(row)
+            for event, match in pending:
+                self.apply(event, match)
+
+    def unsubscribe(self):
+        self.subscribers -= 1
+        if self.subscribers <= 0:
+            self.subscribers = 0
+            self.clear()
+
+    def clear(self):
+        self._open.clear()
+        self._recent.clear()
+        self._closed.clear()
+        self._loaded = False
+
+    def apply(self, event, match):
+        if self._pending is not None:
+            self._pending.append((event, match))
+            return
+        if not self._loaded:
+            return
+        if event == 'removed':
+            self._open.pop(match['id'], None)
+            self._closed.add(match['id'])
+            return
+        self._upsert(match)
+
+    def _upsert(self, match):
+        match_id = match['id']
+        if match_id in self._closed:
+            return
+        current = self._open.get(match_id)
+        if current is not None and _RANK[current['status']] > _RANK[match['status']]:
+            return
+        if match['status'] != 'END':
+            self._open[match_id] = match
+            return
+        self._open.pop(match_id, None)
+        self._closed.add(match_id)
+        self._recent[match_id] = match
+        if len(self._recent) > self.recent_limit:
+            oldest = _newest(self._recent.values(), 'end_time')[-1]
+            del self._recent[oldest['id']]
+
+    def snapshot(self):
+        waiting = [m for m in self._open.values() if m['status'] == 'WAIT']
+        live = [m for m in self._open.values() if m['status'] == 'LIVE']
+        return {
+            'type': 'snapshot',
+            'limits': {'waiting': WAITING_LIMIT, 'live': LIVE_LIMIT, 'recent': self.recent_limit},
+            'waiting': _newest(waiting, 'start_time', WAITING_LIMIT),
+            'live': _newest(live, 'start_time', LIVE_LIMIT),
+            'recent': _newest(self._recent.values(), 'end_time'),
+        }
+
+
+@database_sync_to_async
+def _load_rows(recent_limit):
+    matches = Match.objects.select_related('player_white', 'player_black').defer('current_fen', 'packed_moves')
+    rows = [summary(match) for match in matches.filter(status__in=('WAIT', 'LIVE'))]
+    recent = matches.filter(status='END').order_by('-end_time')[:recent_limit]
+    return rows + [summary(match) for match in recent]
+
+
+lobby = LobbyModel()
+
+
+def lobby_event(event, match):
+    """The group event for ``event`` on ``match`` (a summary dict)."""
+    return {
+        'type': 'lobby_event',
+        'event': event,
+        'match': match,
+        'frame': encode({'type': event, 'match': match}),
+    }
+
+
+def publish(event, match):
+    """
+    Tell lobby subscribers about ``event`` on ``match`` once the current
+    transaction commits. Safe to call from sync views and from
+    ``database_sync_to_async`` code.
+    """
+    if event not in EVENTS:
+        raise ValueError(f'Unknown lobby event {event!r}')
+    data = {'id': match.id} if event == 'removed' else summary(match)
+    message = lobby_event(event, data)
+
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(GROUP, message)
+
+    transaction.on_commit(send)
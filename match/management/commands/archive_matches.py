@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from match.archive import archive
+from match.models import Match
+
+from .compact_matches import vacuum
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'MATCH_ARCHIVE_AFTER_DAYS', 90)
+
+
+class Command(BaseCommand):
+    help = "Move the moves of matches that ended long ago into the cold-storage archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="Run VACUUM afterwards so SQLite returns the freed pages to the filesystem",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        pending = (
+            Match.objects
+            .filter(status='END', archived=False, end_time__lt=cutoff)
+            .order_by('id')
+        )
+
+        archived = moved = skipped = 0
+        last_id = 0
+        with archive.writer() as writer:
+            while True:
+                batch = list(pending.filter(id__gt=last_id)[:options['batch_size']])
+                if not batch:
+                    break
+                ids = []
+                for match in batch:
+                    match.compact()
+                    if not match.is_compacted:
+                        # Hand-edited history that does not replay; keep it hot.
+                        skipped += 1
+                        continue
+                    writer.append(match.id, match.packed_moves)
+                    moved += len(match.packed_moves)
+                    ids.append(match.id)
+                # Records must be durable and indexed before the rows let go.
+                writer.commit()
+                Match.objects.filter(id__in=ids).update(archived=True, packed_moves=None)
+                archived += len(ids)
+                last_id = batch[-1].id
+
+        self.stdout.write(f"Archived {archived} matches ended before {cutoff:%Y-%m-%d}")
+        self.stdout.write(f"Move data moved out of the database: {moved / 1024:.1f} KiB")
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {skipped} matches whose history does not replay"))
+
+        if options['vacuum']:
+            vacuum(self.stdout)
@@ -0,0 +1,111 @@
+import time
+
+import chess
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from match.engine import LiveGame, commit_move
+from match.loadtest import scripted_game
+from match.models import Match
+
+User = get_user_model()
+
+TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+def count_queries(captured):
+    """``(statements, transaction control)`` among captured queries."""
+    control = sum(query['sql'].lstrip().upper().startswith(TRANSACTION_CONTROL) for query in captured)
+    return len(captured) - control, control
+
+
+def legacy_move(match_id, uci):
+    """The per-move query pattern MatchConsumer used before the live registry."""
+    match = Match.objects.get(id=match_id)
+    board = chess.Board(match.current_fen)
+    move = chess.Move.from_uci(uci)
+    if move not in board.legal_moves:
+        raise ValueError(uci)
+    board.push(move)
+    new_fen = board.fen()
+
+    match = Match.objects.get(id=match_id)
+    match.add_move(uci, uci[:2], uci[2:4], new_fen)
+
+    board = chess.Board(new_fen)
+    if board.is_game_over():
+        Match.objects.filter(id=match_id).update(status='END')
+
+
+def committed_move(game, uci):
+    move = game.parse_move(uci[:2], uci[2:4], uci[4:] or None)
+    if move is None:
+        raise ValueError(uci)
+    expected_ply = game.ply
+    game.push(move)
+    outcome = game.outcome()
+    status_update = None
+    if outcome['game_over']:
+        status_update = {'status': 'END', 'result': outcome['result']}
+    if not commit_move(game, expected_ply, status_update):
+        raise RuntimeError(f'stale commit at ply {expected_ply}')
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-move persistence: legacy read-modify-save vs conditional commit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=10)
+        parser.add_argument('--plies', type=int, default=120)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        games, plies = options['games'], options['plies']
+        scripts = [scripted_game(plies, options['seed'] + i) for i in range(games)]
+
+        results = []
+        # Everything happens in one transaction that is rolled back, so the
+        # bench players and their games are never left behind.
+        with transaction.atomic():
+            white, _ = User.objects.get_or_create(username='bench_white')
+            black, _ = User.objects.get_or_create(username='bench_black')
+            for label, runner in (('legacy', self.run_legacy), ('commit', self.run_commit)):
+                matches = [
+                    Match.objects.create(player_white=white, player_black=black, status='LIVE')
+                    for _ in scripts
+                ]
+                results.append((label, *runner(matches, scripts)))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{games} games x {plies} plies")
+        self.stdout.write("statements/move leaves out BEGIN/COMMIT and savepoints, counted in tx/move")
+        self.stdout.write(f"{'path':<8} {'moves':>7} {'statements/move':>16} {'tx/move':>8} {'moves/sec':>10}")
+        for label, moves, (statements, control), elapsed in results:
+            self.stdout.write(
+                f"{label:<8} {moves:>7} {statements / moves:>16.2f} {control / moves:>8.2f} {moves / elapsed:>10.1f}"
+            )
+
+    def run_legacy(self, matches, scripts):
+        moves = 0
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for match, script in zip(matches, scripts):
+                for uci in script:
+                    legacy_move(match.id, uci)
+                    moves += 1
+            elapsed = time.perf_counter() - start
+        return moves, count_queries(ctx.captured_queries), elapsed
+
+    def run_commit(self, matches, scripts):
+        moves = 0
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for match, script in zip(matches, scripts):
+                game = LiveGame.from_match(match)
+                for uci in script:
+                    committed_move(game, uci)
+                    moves += 1
+            elapsed = time.perf_counter() - start
+        return moves, count_queries(ctx.captured_queries), elapsed
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from match.models import Match
+
+
+class Command(BaseCommand):
+    help = "Convert ended matches to packed move storage and report the space reclaimed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="Run VACUUM afterwards so SQLite returns the freed pages to the filesystem",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = (
+            Match.objects
+            .filter(status='END', archived=False, packed_moves__isnull=True)
+            .order_by('id')
+        )
+
+        converted = reclaimed = 0
+        last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for match in batch:
+                reclaimed += match.compact()
+                converted += match.is_compacted
+            last_id = batch[-1].id
+
+        self.stdout.write(f"Compacted {converted} ended matches")
+        self.stdout.write(f"Move data reclaimed: {reclaimed / 1024:.1f} KiB")
+
+        if options['vacuum']:
+            vacuum(self.stdout)
+
+
+def database_size():
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA page_count')
+        pages = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return pages * cursor.fetchone()[0]
+
+
+def vacuum(stdout):
+    """VACUUM a SQLite database and report the file size before and after."""
+    if connection.vendor != 'sqlite':
+        return
+    before = database_size()
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+    after = database_size()
+    stdout.write(f"Database file: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB")
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from match.models import Match
+from match.pgn import EXPORT_BATCH_SIZE, filter_matches, iter_pgn, parse_day
+
+
+class Command(BaseCommand):
+    help = "Stream matches as PGN, optionally filtered by player, status, dates and tournament"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--player', help="Username playing either colour")
+        parser.add_argument('--status', choices=[code for code, _ in Match.STATUS_CHOICES])
+        parser.add_argument('--since', help="First start date, YYYY-MM-DD")
+        parser.add_argument('--until', help="Last start date, YYYY-MM-DD")
+        parser.add_argument('--tournament', type=int, help="Tournament id")
+        parser.add_argument('--output', '-o', help="File to write; stdout by default")
+        parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_day(options['since'])
+            until = parse_day(options['until'])
+        except ValueError as e:
+            raise CommandError(f"Dates must be YYYY-MM-DD, got {e}")
+        matches = filter_matches(
+            player=options['player'],
+            status=options['status'],
+            since=since,
+            until=until,
+            tournament=options['tournament'],
+        )
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        games = 0
+        try:
+            for chunk in iter_pgn(matches, options['batch_size']):
+                out.write(chunk)
+                games += sum(line.startswith('[Event ') for line in chunk.splitlines())
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['output']:
+            self.stdout.write(f"Exported {games} games to {options['output']}")
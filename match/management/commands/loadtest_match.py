@@ -0,0 +1,114 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from match import compute, loadtest
+from match.models import Match
+
+User = get_user_model()
+
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class Command(BaseCommand):
+    help = "Play concurrent games with spectators through MatchConsumer and report throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=20)
+        parser.add_argument('--spectators', type=int, default=100,
+                            help="Spectator sockets, spread across the games")
+        parser.add_argument('--plies', type=int, default=80,
+                            help="Length of generated games when no PGN is given")
+        parser.add_argument('--pgn', help="Replay games from this PGN file instead")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--think-ms', type=int, default=0,
+                            help="Pause between a move's echo and the next move")
+        parser.add_argument('--base-seconds', type=int,
+                            help="Play with clocks running at this time control")
+        parser.add_argument('--trace-memory', action='store_true',
+                            help="Report the tracemalloc peak (much slower)")
+        parser.add_argument('--executor', default='',
+                            help="Comma-separated chess pools to compare, "
+                                 f"from {', '.join(compute.EXECUTOR_KINDS)}; "
+                                 "defaults to MATCH_CHESS_EXECUTOR")
+        parser.add_argument('--workers', type=int, help="Chess pool size")
+
+    def handle(self, *args, **options):
+        games = options['games']
+        if games < 1:
+            raise CommandError("--games must be at least 1")
+        if options['pgn']:
+            source = loadtest.pgn_games(options['pgn'])
+            if not source:
+                raise CommandError(f"No games found in {options['pgn']}")
+            scripts = [source[i % len(source)] for i in range(games)]
+        else:
+            scripts = [
+                loadtest.scripted_game(options['plies'], options['seed'] + i)
+                for i in range(games)
+            ]
+
+        kinds = [kind for kind in options['executor'].split(',') if kind]
+        for kind in kinds:
+            if kind not in compute.EXECUTOR_KINDS:
+                raise CommandError(f"Unknown executor {kind!r}")
+        # The consumers commit on their own connections, so nothing can be
+        # rolled back; players made here are deleted, their games with them.
+        white, white_created = User.objects.get_or_create(username='loadtest_white')
+        black, black_created = User.objects.get_or_create(username='loadtest_black')
+        try:
+            for kind in kinds or [compute.pool.kind]:
+                compute.configure(kind, options['workers'])
+                label = 'inline' if kind == 'inline' else f"{kind} pool, {compute.pool.workers} workers"
+                self.stdout.write(f"[chess analysis: {label}]")
+                self.report(self.run_once(white, black, scripts, options))
+                self.stdout.write('')
+        finally:
+            compute.pool.shutdown()
+            User.objects.filter(
+                id__in=[user.id for user, created in ((white, white_created), (black, black_created)) if created]
+            ).delete()
+
+    def run_once(self, white, black, scripts, options):
+        matches = [
+            Match.objects.create(
+                player_white=white,
+                player_black=black,
+                status='LIVE',
+                base_seconds=options['base_seconds'],
+            )
+            for _ in scripts
+        ]
+        try:
+            with override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER):
+                report = asyncio.run(loadtest.run(
+                    [(match.id, white, black) for match in matches],
+                    scripts,
+                    options['spectators'],
+                    think=options['think_ms'] / 1000,
+                    trace_memory=options['trace_memory'],
+                ))
+        finally:
+            Match.objects.filter(id__in=[m.id for m in matches]).delete()
+        return report
+
+    def report(self, report):
+        self.stdout.write(
+            f"{report['games']} games, {report['spectators']} spectators, "
+            f"{report['moves']} moves in {report['elapsed']:.2f}s"
+        )
+        if report['rejected']:
+            self.stdout.write(self.style.WARNING(f"{report['rejected']} games stopped on a rejected move"))
+        if report['undelivered']:
+            self.stdout.write(self.style.WARNING(f"{report['undelivered']} sockets missed a final broadcast"))
+        self.stdout.write(f"{'moves/sec':<22} {report['moves_per_sec']:>10.1f}")
+        self.stdout.write(f"{'frames delivered':<22} {report['frames']:>10}")
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            label = f"{key[:3]} move->broadcast ms"
+            self.stdout.write(f"{label:<22} {report[key]:>10.2f}")
+        self.stdout.write(f"{'queries/move':<22} {report['queries_per_move']:>10.2f}")
+        if report['peak_traced_kib'] is not None:
+            self.stdout.write(f"{'peak traced KiB':<22} {report['peak_traced_kib']:>10.0f}")
+        self.stdout.write(f"{'max RSS KiB':<22} {report['max_rss_kib']:>10}")
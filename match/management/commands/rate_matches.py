@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts.ratings import BATCH_SIZE, rate_matches, rateable
+from match.models import Match
+
+
+class Command(BaseCommand):
+    help = "Apply the results of finished matches that have not been rated yet, oldest first"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        pending = rateable(Match.objects).order_by('end_time', 'id').values_list('id', flat=True)
+        rated = 0
+        while True:
+            ids = list(pending[:options['batch_size']])
+            if not ids:
+                break
+            rated += rate_matches(ids)
+        self.stdout.write(f"Rated {rated} matches")
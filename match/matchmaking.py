@@ -0,0 +1,237 @@
+"""
+Rating-based automatic pairing.
+
+Players seek a game at one of the club's time controls over
+``ws/seek/``. Each time control has a pool of open seeks kept sorted by
+rating, so a new seek finds its closest-rated partner by bisecting, and
+pairing never scans every pair of seekers. Two seeks pair when their
+rating gap fits both players' windows; a window starts at
+``MATCH_SEEK_RATING_WINDOW`` points and widens by
+``MATCH_SEEK_WINDOW_GROWTH`` points a second while the player waits, so
+someone with no close-rated opponent online still gets a game.
+
+One asyncio task per worker re-tries waiting seeks as their windows
+widen, and stops when every pool is empty. Pools are per worker: seekers
+connected to different workers are not paired with each other.
+"""
+import asyncio
+import itertools
+import logging
+import random
+import time
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from sortedcontainers import SortedList
+
+from accounts.models import UserProfile
+
+from .lobby import publish as publish_lobby
+from .models import Match
+
+# (base minutes, increment seconds)
+TIME_CONTROLS = [
+    tuple(control)
+    for control in getattr(settings, 'MATCH_SEEK_TIME_CONTROLS', [(3, 2), (5, 0), (10, 0), (15, 10)])
+]
+RATING_WINDOW = getattr(settings, 'MATCH_SEEK_RATING_WINDOW', 100)
+WINDOW_GROWTH = getattr(settings, 'MATCH_SEEK_WINDOW_GROWTH', 10)
+MAX_RATING_WINDOW = getattr(settings, 'MATCH_SEEK_MAX_RATING_WINDOW', 800)
+PAIRING_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class Seek:
+    def __init__(self, user_id, username, rating, time_control, channel_name, now=None):
+        self.user_id = user_id
+        self.username = username
+        self.rating = rating
+        self.time_control = time_control
+        self.channel_name = channel_name
+        self.since = time.monotonic() if now is None else now
+
+    def window(self, now):
+        grown = RATING_WINDOW + WINDOW_GROWTH * (now - self.since)
+        return min(grown, MAX_RATING_WINDOW)
+
+    def accepts(self, other, now):
+        gap = abs(self.rating - other.rating)
+        return gap <= self.window(now) and gap <= other.window(now)
+
+
+class SeekPool:
+    """Open seeks for one time control, sorted by rating."""
+
+    def __init__(self):
+        self._counter = itertools.count()
+        # (rating, arrival, seek): arrival keeps entries unique and FIFO.
+        self._entries = SortedList()
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, seek):
+        key = (seek.rating, next(self._counter), seek)
+        self._keys[seek.user_id] = key
+        self._entries.add(key)
+
+    def remove(self, seek):
+        key = self._keys.get(seek.user_id)
+        if key is None or key[2] is not seek:
+            return False
+        del self._keys[seek.user_id]
+        self._entries.remove(key)
+        return True
+
+    def partner(self, seek, now):
+        """The closest-rated seek that ``seek`` can be paired with, or None."""
+        key = self._keys.get(seek.user_id)
+        if key is None:
+            return None
+        entries = self._entries
+        index = entries.index(key)
+        reach = seek.window(now)
+        below, above = index - 1, index + 1
+        # Walk outwards in rating order, nearest first, until both sides
+        # are out of ``seek``'s own window.
+        while True:
+            low = entries[below][2] if below >= 0 else None
+            high = entries[above][2] if above < len(entries) else None
+            if low is not None and seek.rating - low.rating > reach:
+                low = None
+            if high is not None and high.rating - seek.rating > reach:
+                high = None
+            if low is None and high is None:
+                return None
+            if high is None or (low is not None and seek.rating - low.rating <= high.rating - seek.rating):
+                if seek.accepts(low, now):
+                    return low
+                below -= 1
+            else:
+                if seek.accepts(high, now):
+                    return high
+                above += 1
+
+
+class Matchmaker:
+    def __init__(self):
+        self.pools = {control: SeekPool() for control in TIME_CONTROLS}
+        self.seeks = {}
+        self._task = None
+
+    def __len__(self):
+        return len(self.seeks)
+
+    def add(self, seek):
+        """Queue ``seek``, replacing the player's previous one; returns that."""
+        previous = self.seeks.get(seek.user_id)
+        if previous is not None:
+            self.remove(previous)
+        self.seeks[seek.user_id] = seek
+        self.pools[seek.time_control].add(seek)
+        return previous
+
+    def remove(self, seek):
+        if self.seeks.get(seek.user_id) is not seek:
+            return False
+        del self.seeks[seek.user_id]
+        self.pools[seek.time_control].remove(seek)
+        return True
+
+    def take_pair(self, seek, now=None):
+        """Remove and return ``(seek, partner)`` if ``seek`` can be paired now."""
+        if self.seeks.get(seek.user_id) is not seek:
+            return None
+        now = time.monotonic() if now is None else now
+        partner = self.pools[seek.time_control].partner(seek, now)
+        if partner is None:
+            return None
+        self.remove(seek)
+        self.remove(partner)
+        return seek, partner
+
+    def take_pairs(self, now=None):
+        """Pair everything that can be paired, oldest seeks first."""
+        now = time.monotonic() if now is None else now
+        pairs = []
+        for seek in sorted(self.seeks.values(), key=lambda s: s.since):
+            pair = self.take_pair(seek, now)
+            if pair:
+                pairs.append(pair)
+        return pairs
+
+    async def submit(self, seek):
+        """Queue ``seek`` and pair it at once if a partner is waiting."""
+        previous = self.add(seek)
+        if previous is not None and previous.channel_name != seek.channel_name:
+            await notify(previous, {'type': 'seek_cancelled', 'reason': 'Replaced by a newer seek'})
+        pair = self.take_pair(seek)
+        if pair:
+            await start_game(*pair)
+        self.ensure_running()
+
+    def ensure_running(self):
+        if self.seeks and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._pair_forever())
+
+    async def _pair_forever(self):
+        while self.seeks:
+            await asyncio.sleep(PAIRING_INTERVAL)
+            for first, second in self.take_pairs():
+                # One pair failing (e.g. a notify to a closed channel) must
+                # not stop the loop and strand everyone else's seeks.
+                try:
+                    await start_game(first, second)
+                except Exception:
+                    logger.exception('Pairing %s and %s failed', first.username, second.username)
+
+
+@database_sync_to_async
+def player_rating(user_id):
+    rating = UserProfile.objects.filter(user_id=user_id).values_list('rating', flat=True).first()
+    return UserProfile._meta.get_field('rating').default if rating is None else rating
+
+
+@database_sync_to_async
+def create_match(white, black, time_control):
+    base_minutes, increment = time_control
+    match = Match.objects.create(
+        player_white_id=white.user_id,
+        player_black_id=black.user_id,
+        status='LIVE',
+        base_seconds=base_minutes * 60,
+        increment_seconds=increment,
+    )
+    match = Match.objects.select_related('player_white', 'player_black').get(id=match.id)
+    publish_lobby('started', match)
+    return match.id
+
+
+async def notify(seek, payload):
+    await get_channel_layer().send(seek.channel_name, {'type': 'seek_message', 'payload': payload})
+
+
+async def start_game(first, second):
+    white, black = (first, second) if random.random() < 0.5 else (second, first)
+    try:
+        match_id = await create_match(white, black, white.time_control)
+    except Exception:
+        logger.exception('Could not create a game for %s and %s', white.username, black.username)
+        for seek in (white, black):
+            await notify(seek, {'type': 'seek_failed', 'message': 'Could not create the game'})
+        return
+    for seek, color, opponent in ((white, 'white', black), (black, 'black', white)):
+        await notify(seek, {
+            'type': 'paired',
+            'match_id': match_id,
+            'color': color,
+            'opponent': opponent.username,
+            'opponent_rating': opponent.rating,
+            'redirect_url': f'/match/{match_id}/',
+        })
+
+
+matchmaker = Matchmaker()
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+def populate_ply(apps, schema_editor):
+    Match = apps.get_model('match', 'Match')
+    for match in Match.objects.only('id', 'move_history').iterator():
+        history = match.move_history if isinstance(match.move_history, list) else []
+        if history:
+            Match.objects.filter(id=match.id).update(ply=len(history))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0002_match_scheduled_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='ply',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_ply, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:37
+
+from itertools import groupby
+from operator import itemgetter
+
+import chess
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_move_history(apps, schema_editor):
+    Match = apps.get_model('match', 'Match')
+    MatchMove = apps.get_model('match', 'MatchMove')
+    for match in Match.objects.only('id', 'move_history', 'ply').iterator():
+        history = match.move_history if isinstance(match.move_history, list) else []
+        board = chess.Board()
+        moves = []
+        for entry in history:
+            if not isinstance(entry, dict):
+                continue
+            # Older entries stored the UCI string under 'san'.
+            try:
+                move = chess.Move.from_uci(entry.get('uci') or entry.get('san') or '')
+            except ValueError:
+                try:
+                    move = chess.Move.from_uci((entry.get('from') or '') + (entry.get('to') or ''))
+                except ValueError:
+                    move = None
+            if not move:
+                # No move to store (or to pack later); drop the entry.
+                continue
+            san = entry.get('san') or move.uci()
+            fen = entry.get('fen') or ''
+            if board is not None and move in board.legal_moves:
+                san = board.san(move)
+                board.push(move)
+                fen = fen or board.fen()
+            else:
+                board = None
+            if not fen:
+                continue
+            moves.append(MatchMove(
+                match_id=match.id,
+                ply=len(moves) + 1,
+                san=san[:10],
+                uci=move.uci(),
+                fen=fen
+            ))
+        MatchMove.objects.bulk_create(moves, batch_size=500)
+        if match.ply != len(moves):
+            # 0003 counted the dropped entries too.
+            Match.objects.filter(id=match.id).update(ply=len(moves))
+
+
+def restore_move_history(apps, schema_editor):
+    Match = apps.get_model('match', 'Match')
+    MatchMove = apps.get_model('match', 'MatchMove')
+    rows = MatchMove.objects.order_by('match_id', 'ply').values_list('match_id', 'san', 'uci', 'fen')
+    for match_id, moves in groupby(rows.iterator(), key=itemgetter(0)):
+        history = [
+            {'san': san, 'uci': uci, 'from': uci[:2], 'to': uci[2:4], 'fen': fen}
+            for _, san, uci, fen in moves
+        ]
+        Match.objects.filter(id=match_id).update(move_history=history)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0003_match_ply'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ply', models.PositiveIntegerField()),
+                ('san', models.CharField(max_length=10)),
+                ('uci', models.CharField(max_length=5)),
+                ('fen', models.CharField(max_length=100)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='match.match')),
+            ],
+            options={
+                'ordering': ['ply'],
+                'constraints': [models.UniqueConstraint(fields=('match', 'ply'), name='unique_match_ply')],
+            },
+        ),
+        migrations.RunPython(copy_move_history, restore_move_history),
+        migrations.RemoveField(
+            model_name='match',
+            name='move_history',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0004_matchmove'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='packed_moves',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0005_match_packed_moves'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='base_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='black_clock_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='clock_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='increment_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='white_clock_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
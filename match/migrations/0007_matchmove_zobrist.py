@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:50
+
+import chess
+import chess.polyglot
+from django.db import migrations, models
+
+
+def fill_zobrist(apps, schema_editor):
+    MatchMove = apps.get_model('match', 'MatchMove')
+    batch = []
+    for move in MatchMove.objects.only('id', 'fen').iterator():
+        try:
+            key = chess.polyglot.zobrist_hash(chess.Board(move.fen))
+        except ValueError:
+            continue
+        move.zobrist = key - (1 << 64) if key >= 1 << 63 else key
+        batch.append(move)
+        if len(batch) >= 500:
+            MatchMove.objects.bulk_update(batch, ['zobrist'])
+            batch = []
+    MatchMove.objects.bulk_update(batch, ['zobrist'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0006_match_clock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchmove',
+            name='zobrist',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_zobrist, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0007_matchmove_zobrist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='archived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0008_match_archived'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'start_time'], name='match_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'end_time'], name='match_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:04
+
+from django.db import migrations, models
+
+
+def mark_existing_rated(apps, schema_editor):
+    # Ratings were maintained by hand before; don't re-rate old games.
+    Match = apps.get_model('match', 'Match')
+    Match.objects.filter(status='END').update(rated=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0009_match_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='rated',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_existing_rated, migrations.RunPython.noop),
+    ]
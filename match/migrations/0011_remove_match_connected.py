@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:43
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0010_match_rated'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='match',
+            name='black_connected',
+        ),
+        migrations.RemoveField(
+            model_name='match',
+            name='white_connected',
+        ),
+    ]
@@ -1,9 +1,17 @@
+import logging
+
+import chess
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-import json
+from .archive import archive
+from .codec import pack_moves, position_key, replay, signed_key
+
+logger = logging.getLogger(__name__)
+
 
 class Match(models.Model):
     STATUS_CHOICES = [
@@ -36,33 +44,94 @@ class Match(models.Model):
     )
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='WAIT')
     current_fen = models.TextField(default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
-    move_history = models.JSONField(default=list)
+    ply = models.PositiveIntegerField(default=0)
+    # Finished games keep only their packed move list (see match.codec).
+    packed_moves = models.BinaryField(null=True, blank=True, editable=False)
+    # Old finished games keep their moves in cold storage (see match.archive).
+    archived = models.BooleanField(default=False, editable=False)
+    # Set once the result has been applied to both players' ratings.
+    rated = models.BooleanField(default=False, editable=False)
+    
+    # Time control; untimed when base_seconds is empty (see match.clock).
+    base_seconds = models.PositiveIntegerField(null=True, blank=True)
+    increment_seconds = models.PositiveIntegerField(default=0)
+    white_clock_ms = models.PositiveIntegerField(null=True, blank=True)
+    black_clock_ms = models.PositiveIntegerField(null=True, blank=True)
+    clock_started_at = models.DateTimeField(null=True, blank=True)
     scheduled_start = models.DateTimeField(null=True, blank=True)
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
     result = models.CharField(max_length=10, choices=RESULT_CHOICES, default='*')
     
-    
-    white_connected = models.BooleanField(default=False)
-    black_connected = models.BooleanField(default=False)
+    class Meta:
+        # Lobby lists filter by status and page by start/end time.
+        indexes = [
+            models.Index(fields=['status', 'start_time'], name='match_status_start_idx'),
+            models.Index(fields=['status', 'end_time'], name='match_status_end_idx'),
+        ]
     
     def __str__(self):
         white_name = self.player_white.username if self.player_white else "Waiting"
         black_name = self.player_black.username if self.player_black else "Waiting"
         return f"{white_name} vs {black_name}"
     
-    def add_move(self, move_san, move_from, move_to, fen):
-        move_data = {
-            'san': move_san,
-            'from': move_from,
-            'to': move_to,
-            'fen': fen
-        }
-        if not isinstance(self.move_history, list):
-            self.move_history = []
-        self.move_history.append(move_data)
+    def load_from_archive(self):
+        """Fill in the packed moves of an archived match, in memory only."""
+        if self.archived and self.packed_moves is None:
+            self.packed_moves = archive.get(self.id)
+            if self.packed_moves is None:
+                logger.error('Match %s is archived but its record is missing from %s', self.id, archive.root)
+        return self
+    
+    @property
+    def move_history(self):
+        self.load_from_archive()
+        if self.packed_moves is not None:
+            return replay(self.packed_moves)
+        return [move.to_dict() for move in self.moves.all()]
+    
+    @property
+    def is_compacted(self):
+        return self.packed_moves is not None
+    
+    def compact(self):
+        """
+        Replace a finished game's move rows with its packed move list.
+
+        Returns the number of bytes of move data removed, net of the packed
+        list that replaces them.
+        """
+        if self.status != 'END' or self.is_compacted or self.archived:
+            return 0
+        with transaction.atomic():
+            rows = list(self.moves.values_list('uci', 'san', 'fen'))
+            try:
+                packed = pack_moves(uci for uci, _, _ in rows)
+                replays = not rows or replay(packed)[-1]['fen'] == rows[-1][2]
+            except ValueError:
+                replays = False
+            if not replays:
+                # Hand-edited history that does not pack or replay; keep the rows.
+                return 0
+            # Each row also carries three 8-byte integers (id, match, ply).
+            before = sum(len(uci) + len(san) + len(fen) + 24 for uci, san, fen in rows)
+            self.packed_moves = packed
+            self.save(update_fields=['packed_moves'])
+            self.moves.all().delete()
+        return before - len(packed)
+    
+    def add_move(self, move_san, move_from, move_to, fen, move_uci=None):
+        MatchMove.objects.create(
+            match=self,
+            ply=self.ply + 1,
+            san=move_san,
+            uci=move_uci or move_from + move_to,
+            fen=fen,
+            zobrist=signed_key(position_key(chess.Board(fen))),
+        )
         self.current_fen = fen
-        self.save()
+        self.ply += 1
+        self.save(update_fields=['current_fen', 'ply'])
     
     def get_current_turn(self):
         
@@ -92,4 +161,35 @@ class Match(models.Model):
             return 'white'
         elif self.player_black == user:
             return 'black'
-        return None
\ No newline at end of file
+        return None
+
+
+class MatchMove(models.Model):
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='moves')
+    ply = models.PositiveIntegerField()
+    san = models.CharField(max_length=10)
+    uci = models.CharField(max_length=5)
+    fen = models.CharField(max_length=100)
+    # Zobrist key of the position after this move, for repetition counts.
+    zobrist = models.BigIntegerField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        ordering = ['ply']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['match', 'ply'],
+                name='unique_match_ply'
+            )
+        ]
+    
+    def __str__(self):
+        return f"{self.match_id}#{self.ply} {self.san}"
+    
+    def to_dict(self):
+        return {
+            'san': self.san,
+            'uci': self.uci,
+            'from': self.uci[:2],
+            'to': self.uci[2:4],
+            'fen': self.fen
+        }
@@ -0,0 +1,50 @@
+"""
+Keyset (cursor) pagination, newest first.
+
+A page is ordered by ``(field, id)`` descending and the cursor names the
+last row shown, so fetching the next page is an index range scan from
+that row rather than an OFFSET that re-reads everything before it. Rows
+with an empty ``field`` are never paged.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(value, pk):
+    return f'{(value - EPOCH) // MICROSECOND}.{pk}'
+
+
+def decode_cursor(cursor):
+    """``(datetime, id)`` of a cursor; ValueError if it is malformed."""
+    micros, _, pk = cursor.partition('.')
+    try:
+        return EPOCH + int(micros) * MICROSECOND, int(pk)
+    except OverflowError:
+        raise ValueError(cursor)
+
+
+def keyset_page(queryset, field, cursor=None, limit=20):
+    """
+    One page of ``queryset`` newest first by ``field``.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last
+    page. ``cursor`` may be a string from a previous page.
+    """
+    queryset = queryset.filter(**{f'{field}__isnull': False}).order_by(f'-{field}', '-id')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        )
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_cursor(last[field], last['id'])
+    return rows, encode_cursor(getattr(last, field), last.id)
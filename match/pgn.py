@@ -0,0 +1,161 @@
+"""
+Streaming PGN export.
+
+Matches are read in primary-key order with keyset pagination (``id > last
+id``), one batch at a time, and their moves are fetched per batch: packed
+games carry theirs in the row, others read only the UCI column of their
+MatchMove rows, and archived games read theirs from cold storage. Memory
+is bounded by the batch size no matter how many games are exported.
+"""
+import textwrap
+from itertools import groupby
+
+import chess
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .codec import unpack_moves
+from .models import Match, MatchMove
+
+EXPORT_BATCH_SIZE = 200
+SITE = 'IIIT Chess Club'
+
+
+def parse_day(value):
+    """A YYYY-MM-DD filter value as a date, None if empty; ValueError if malformed."""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+def filter_matches(queryset=None, player=None, status=None, since=None, until=None, tournament=None):
+    """
+    Narrow ``queryset`` (all matches by default) for export.
+
+    ``player`` is a username, ``since``/``until`` are inclusive dates on the
+    match start, and ``tournament`` is a tournament id.
+    """
+    if queryset is None:
+        queryset = Match.objects.all()
+    if player:
+        queryset = queryset.filter(
+            Q(player_white__username=player) | Q(player_black__username=player)
+        )
+    if status:
+        queryset = queryset.filter(status=status)
+    if since:
+        queryset = queryset.filter(start_time__date__gte=since)
+    if until:
+        queryset = queryset.filter(start_time__date__lte=until)
+    if tournament:
+        queryset = queryset.filter(tournament_pairing__tournament_id=tournament)
+    return queryset
+
+
+def _tag(name, value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'[{name} "{value}"]'
+
+
+def _movetext(moves, result):
+    board = chess.Board()
+    tokens = []
+    for move in moves:
+        if move is None or not board.is_legal(move):
+            # Hand-edited history; export the playable prefix.
+            tokens.append('{ history truncated }')
+            break
+        if board.turn == chess.WHITE:
+            tokens.append(f'{board.fullmove_number}.')
+        tokens.append(board.san(move))
+        board.push(move)
+    tokens.append(result)
+    return textwrap.fill(' '.join(tokens), width=79, break_long_words=False, break_on_hyphens=False)
+
+
+def game_pgn(match, moves):
+    """PGN text for ``match`` played with ``moves`` (``chess.Move`` objects)."""
+    pairing = getattr(match, 'tournament_pairing', None)
+    event = pairing.tournament.name if pairing else 'Casual game'
+    result = match.result or '*'
+    tags = [
+        _tag('Event', event),
+        _tag('Site', SITE),
+        _tag('Date', match.start_time.strftime('%Y.%m.%d') if match.start_time else '????.??.??'),
+        _tag('Round', '-'),
+        _tag('White', match.player_white.username if match.player_white else '?'),
+        _tag('Black', match.player_black.username if match.player_black else '?'),
+        _tag('Result', result),
+        _tag('TimeControl', f'{match.base_seconds}+{match.increment_seconds}' if match.base_seconds else '-'),
+        _tag('PlyCount', len(moves)),
+        _tag('MatchId', match.id),
+    ]
+    return '\n'.join(tags) + '\n\n' + _movetext(moves, result) + '\n\n'
+
+
+def _parse_uci(uci):
+    try:
+        return chess.Move.from_uci(uci)
+    except ValueError:
+        return None
+
+
+def _batch_moves(batch):
+    """Map match id -> moves for one batch, without full history entries."""
+    moves = {}
+    unpacked = []
+    for match in batch:
+        match.load_from_archive()
+        if match.packed_moves is not None:
+            moves[match.id] = unpack_moves(match.packed_moves)
+        else:
+            unpacked.append(match.id)
+    if unpacked:
+        rows = (
+            MatchMove.objects
+            .filter(match_id__in=unpacked)
+            .order_by('match_id', 'ply')
+            .values_list('match_id', 'uci')
+            .iterator(chunk_size=2000)
+        )
+        for match_id, group in groupby(rows, key=lambda row: row[0]):
+            moves[match_id] = [_parse_uci(uci) for _, uci in group]
+    return moves
+
+
+def iter_pgn(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the PGN of every match in ``queryset``, one batch of games per chunk."""
+    queryset = (
+        queryset
+        .select_related('player_white', 'player_black', 'tournament_pairing__tournament')
+        .defer('current_fen')
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        moves = _batch_moves(batch)
+        yield ''.join(game_pgn(match, moves.get(match.id, [])) for match in batch)
+        last_id = batch[-1].id
+
+
+async def aiter_pgn(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """
+    :func:`iter_pgn` for ASGI responses.
+
+    StreamingHttpResponse buffers synchronous iterators under ASGI, so
+    batches are pulled one at a time on the sync thread instead.
+    """
+    chunks = iter_pgn(queryset, batch_size)
+    pull = sync_to_async(next)
+    while True:
+        chunk = await pull(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,101 @@
+"""
+In-process presence for match players.
+
+Every player socket holds an entry keyed by (match, colour) that expires
+unless it is refreshed by a heartbeat (any message from the client counts).
+``white_connected``/``black_connected`` are derived from these entries and
+broadcast only when a colour actually goes from no sockets to some sockets
+or back, so reconnects, extra tabs and spectators cost nothing.
+
+The tracker is the only record of who is connected; nothing is stored in
+the database, so a restarted worker cannot report sockets it no longer
+holds.
+"""
+import asyncio
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .frames import group_broadcast
+
+PRESENCE_TTL = getattr(settings, 'MATCH_PRESENCE_TTL', 30)
+
+
+class PresenceTracker:
+    def __init__(self, ttl=PRESENCE_TTL):
+        self.ttl = ttl
+        # (match_id, colour) -> {channel_name: (username, expires_at)}
+        self._entries = {}
+        self._sweeper = None
+
+    def join(self, match_id, color, channel_name, username):
+        """Register a socket; True if ``color`` was not connected before."""
+        sockets = self._entries.setdefault((int(match_id), color), {})
+        was_connected = bool(sockets)
+        sockets[channel_name] = (username, time.monotonic() + self.ttl)
+        return not was_connected
+
+    def heartbeat(self, match_id, color, channel_name, username):
+        """
+        Refresh a socket's entry, re-registering it if it had lapsed.
+
+        Returns True if that brought ``color`` back to connected.
+        """
+        sockets = self._entries.get((int(match_id), color))
+        if sockets and channel_name in sockets:
+            sockets[channel_name] = (username, time.monotonic() + self.ttl)
+            return False
+        self.ensure_sweeper()
+        return self.join(match_id, color, channel_name, username)
+
+    def leave(self, match_id, color, channel_name):
+        """Drop a socket; True if it was the last one for ``color``."""
+        key = (int(match_id), color)
+        sockets = self._entries.get(key)
+        if not sockets or sockets.pop(channel_name, None) is None:
+            return False
+        if sockets:
+            return False
+        del self._entries[key]
+        return True
+
+    def is_connected(self, match_id, color):
+        return bool(self._entries.get((int(match_id), color)))
+
+    def expire(self):
+        """
+        Drop sockets whose heartbeat lapsed.
+
+        Returns ``(match_id, colour, username)`` for every colour that lost
+        its last socket.
+        """
+        now = time.monotonic()
+        gone = []
+        for key, sockets in list(self._entries.items()):
+            expired = [name for name, (_, expires_at) in sockets.items() if expires_at < now]
+            username = None
+            for name in expired:
+                username, _ = sockets.pop(name)
+            if expired and not sockets:
+                del self._entries[key]
+                gone.append((key[0], key[1], username))
+        return gone
+
+    def ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.ensure_future(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        channel_layer = get_channel_layer()
+        while self._entries:
+            await asyncio.sleep(self.ttl / 2)
+            for match_id, color, username in self.expire():
+                await group_broadcast(channel_layer, f'match_{match_id}', {
+                    'type': 'player_disconnected',
+                    'color': color,
+                    'username': username,
+                })
+
+
+presence = PresenceTracker()
@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/match/(?P<match_id>\w+)/$', consumers.MatchConsumer.as_asgi()),
+    re_path(r'ws/lobby/$', consumers.LobbyConsumer.as_asgi()),
+    re_path(r'ws/seek/$', consumers.SeekConsumer.as_asgi()),
 ]
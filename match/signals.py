@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent once a finished match's result is saved, with ``match``, the Match.
+match_ended = Signal()
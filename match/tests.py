@@ -0,0 +1,196 @@
+import chess
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+
+from . import views
+from .clock import GameClock, timeout_result
+from .codec import pack_moves, replay, unpack_moves
+from .engine import LiveGame, commit_move, reload_game
+from .matchmaking import MAX_RATING_WINDOW, RATING_WINDOW, WINDOW_GROWTH, Matchmaker, Seek
+from .models import Match
+
+
+class LobbyQueryBudgetTests(TestCase):
+    """The lobby runs a fixed number of queries however many games it lists."""
+
+    @classmethod
+    def setUpTestData(cls):
+        players = [User.objects.create(username=f'player{i}') for i in range(6)]
+        for i, white in enumerate(players):
+            black = players[(i + 1) % len(players)]
+            Match.objects.create(player_white=white, status='WAIT')
+            Match.objects.create(player_white=white, player_black=black, status='LIVE')
+            Match.objects.create(
+                player_white=white, player_black=black, status='END',
+                result='1-0', end_time=timezone.now(),
+            )
+
+    def get(self, view, path):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return view(request)
+
+    def test_lobby_view(self):
+        with self.assertNumQueries(3):
+            response = self.get(views.lobby_view, '/match/lobby/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_lobby_data(self):
+        with self.assertNumQueries(2):
+            response = self.get(views.lobby_data, '/match/api/lobby/data/')
+        self.assertEqual(response.status_code, 200)
+
+
+class ExportPgnTests(TestCase):
+    def test_requires_login(self):
+        url = reverse('export_pgn')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create(username='exporter'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-chess-pgn')
+
+
+# Knights out and back twice: the start position occurs for the third time.
+KNIGHT_SHUFFLE = ['g1f3', 'g8f6', 'f3g1', 'f6g8'] * 2
+
+
+class EngineTests(TestCase):
+    def setUp(self):
+        self.match = Match.objects.create(
+            player_white=User.objects.create(username='white'),
+            player_black=User.objects.create(username='black'),
+            status='LIVE',
+        )
+
+    def play(self, game, moves):
+        for uci in moves:
+            ply = game.ply
+            game.push(chess.Move.from_uci(uci))
+            self.assertTrue(commit_move(game, ply))
+
+    def test_repetition_draw(self):
+        game = LiveGame.from_match(self.match)
+        self.play(game, KNIGHT_SHUFFLE[:-1])
+        self.assertFalse(game.outcome()['game_over'])
+        self.play(game, KNIGHT_SHUFFLE[-1:])
+        self.assertEqual(game.outcome()['reason'], 'Draw by repetition')
+
+    def test_repetition_draw_after_reload(self):
+        game = LiveGame.from_match(self.match)
+        self.play(game, KNIGHT_SHUFFLE[:5])
+        async_to_sync(reload_game)(game)
+        self.assertEqual(game.ply, 5)
+        self.play(game, KNIGHT_SHUFFLE[5:])
+        self.assertEqual(game.outcome()['reason'], 'Draw by repetition')
+
+    def test_pawn_move_resets_repetition(self):
+        game = LiveGame.from_match(self.match)
+        self.play(game, ['e2e4', 'e7e5'] + KNIGHT_SHUFFLE[:4] + KNIGHT_SHUFFLE[:3])
+        self.assertEqual(game.positions[game.position_key], 2)
+
+    def test_stale_commit_is_rejected(self):
+        game = LiveGame.from_match(self.match)
+        stale = LiveGame.from_match(self.match)
+        self.play(game, ['e2e4'])
+        stale.push(chess.Move.from_uci('d2d4'))
+        self.assertFalse(commit_move(stale, 0))
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.ply, self.match.moves.count()), (1, 1))
+        self.assertEqual(self.match.current_fen, game.fen)
+
+    def test_commit_after_end_is_rejected(self):
+        game = LiveGame.from_match(self.match)
+        Match.objects.filter(id=self.match.id).update(status='END', result='1-0')
+        game.push(chess.Move.from_uci('e2e4'))
+        self.assertFalse(commit_move(game, 0))
+
+
+class CodecTests(TestCase):
+    def test_round_trip(self):
+        moves = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1b5']
+        packed = pack_moves(moves)
+        self.assertEqual(len(packed), 2 * len(moves))
+        self.assertEqual([move.uci() for move in unpack_moves(packed)], moves)
+        board = chess.Board()
+        for uci in moves:
+            board.push_uci(uci)
+        history = replay(packed)
+        self.assertEqual([entry['san'] for entry in history], ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5'])
+        self.assertEqual(history[-1]['fen'], board.fen())
+
+    def test_promotion(self):
+        moves = ['h2h4', 'g7g5', 'h4g5', 'h7h6', 'g5h6', 'f8g7', 'h6g7', 'b8c6', 'g7h8q', 'c6d4']
+        underpromotion = moves[:-2] + ['g7h8n']
+        for line in (moves, underpromotion):
+            with self.subTest(line=line[-1]):
+                packed = pack_moves(line)
+                self.assertEqual([move.uci() for move in unpack_moves(packed)], line)
+                board = chess.Board()
+                for uci in line:
+                    board.push_uci(uci)
+                self.assertEqual(replay(packed)[-1]['fen'], board.fen())
+        self.assertEqual(replay(pack_moves(moves))[8]['san'], 'gxh8=Q')
+
+
+class ClockTests(TestCase):
+    def test_first_move_starts_the_clock(self):
+        clock = GameClock(60000, 60000, 2000, 'white')
+        self.assertIsNone(clock.deadline())
+        self.assertFalse(clock.flagged(now=10 ** 9))
+        clock.press('white', 100.0)
+        self.assertEqual(clock.remaining['white'], 60000)
+        self.assertEqual((clock.turn, clock.deadline()), ('black', 160.0))
+
+    def test_press_charges_the_mover_and_adds_increment(self):
+        clock = GameClock(60000, 60000, 2000, 'black', running_since=100.0)
+        clock.press('black', 105.5)
+        self.assertEqual(clock.remaining, {'white': 60000, 'black': 56500})
+        self.assertEqual(clock.to_dict(now=110.5), {'white': 55000, 'black': 56500, 'running': 'white'})
+
+    def test_flag_fall(self):
+        clock = GameClock(1000, 60000, 0, 'white', running_since=100.0)
+        self.assertFalse(clock.flagged(now=100.999))
+        self.assertTrue(clock.flagged(now=101.0))
+        self.assertEqual(clock.time_left('white', now=200.0), 0)
+
+    def test_timeout_result(self):
+        game = LiveGame(1, chess.Board(), [], 'LIVE', '*', 0, GameClock(0, 1000, 0, 'white', 100.0))
+        self.assertEqual(timeout_result(game), ('0-1', 'Black wins on time'))
+        game.board = chess.Board('8/8/8/8/8/8/k7/K6N w - - 0 1')
+        game.clock.turn = 'black'
+        self.assertEqual(timeout_result(game)[0], '1/2-1/2')
+
+
+class MatchmakingTests(TestCase):
+    def seek(self, user_id, rating, now=0.0):
+        return Seek(user_id, f'seeker{user_id}', rating, (5, 0), f'channel{user_id}', now=now)
+
+    def test_window_widens_while_waiting(self):
+        seek = self.seek(1, 1500)
+        self.assertEqual(seek.window(0.0), RATING_WINDOW)
+        self.assertEqual(seek.window(3.0), RATING_WINDOW + 3 * WINDOW_GROWTH)
+        self.assertEqual(seek.window(10 ** 6), MAX_RATING_WINDOW)
+
+    def test_distant_seeks_pair_once_both_windows_cover_the_gap(self):
+        matchmaker = Matchmaker()
+        gap = RATING_WINDOW + 5 * WINDOW_GROWTH
+        first, second = self.seek(1, 1500), self.seek(2, 1500 + gap)
+        matchmaker.add(first)
+        matchmaker.add(second)
+        self.assertEqual(matchmaker.take_pairs(now=4.0), [])
+        self.assertEqual(matchmaker.take_pairs(now=5.0), [(first, second)])
+        self.assertEqual(len(matchmaker), 0)
+
+    def test_closest_rating_pairs_first(self):
+        matchmaker = Matchmaker()
+        seeks = [self.seek(1, 1500), self.seek(2, 1560), self.seek(3, 1520)]
+        for seek in seeks:
+            matchmaker.add(seek)
+        self.assertEqual(matchmaker.take_pair(seeks[0], now=0.0), (seeks[0], seeks[2]))
+        self.assertEqual(len(matchmaker), 1)
@@ -12,4 +12,5 @@ urlpatterns = [
     path('api/<int:match_id>/leave/', views.leave_match, name='leave_match'),
     path('api/<int:match_id>/state/', views.match_state, name='match_state'),
     path('api/lobby/data/', views.lobby_data, name='lobby_data'),
+    path('api/export.pgn', views.export_pgn, name='export_pgn'),
 ]
\ No newline at end of file
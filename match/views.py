@@ -1,9 +1,18 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseForbidden
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
+from IIITChessClub.metrics import query_budget
+from .engine import games
+from .lobby import LIVE_LIMIT, RECENT_LIMIT, WAITING_LIMIT, publish as publish_lobby
+from .matchmaking import TIME_CONTROLS
 from .models import Match
+from .paging import keyset_page
+from .pgn import aiter_pgn, filter_matches, iter_pgn, parse_day
+from .presence import presence
+from .signals import match_ended
 import json
 
 def match_view(request, match_id):
@@ -31,16 +40,40 @@ def match_view(request, match_id):
     
     return render(request, 'match.html', context)
 
+def _lobby_matches():
+    return (
+        Match.objects
+        .select_related('player_white', 'player_black')
+        .defer('current_fen', 'packed_moves')
+    )
+
+@query_budget(3)
 def lobby_view(request):
-    
-    waiting_matches = Match.objects.filter(status='WAIT').order_by('-start_time')
-    live_matches = Match.objects.filter(status='LIVE').order_by('-start_time')[:10]
-    recent_matches = Match.objects.filter(status='END').order_by('-end_time')[:10]
+    try:
+        waiting_matches, waiting_next = keyset_page(
+            _lobby_matches().filter(status='WAIT'), 'start_time',
+            request.GET.get('waiting_before'), WAITING_LIMIT,
+        )
+        live_matches, live_next = keyset_page(
+            _lobby_matches().filter(status='LIVE'), 'start_time',
+            request.GET.get('live_before'), LIVE_LIMIT,
+        )
+        recent_matches, recent_next = keyset_page(
+            _lobby_matches().filter(status='END'), 'end_time',
+            request.GET.get('recent_before'), RECENT_LIMIT,
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Invalid page cursor.")
     
     context = {
         'waiting_matches': waiting_matches,
         'live_matches': live_matches,
         'recent_matches': recent_matches,
+        'waiting_next': waiting_next,
+        'live_next': live_next,
+        'recent_next': recent_next,
+        'paged': any(key.endswith('_before') for key in request.GET),
+        'time_controls': TIME_CONTROLS,
     }
     
     return render(request, 'lobby.html', context)
@@ -55,6 +88,7 @@ def create_match(request):
             status='WAIT',
             current_fen='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
         )
+        publish_lobby('created', match)
         
         return JsonResponse({
             'success': True,
@@ -94,6 +128,7 @@ def join_match(request, match_id):
             match.player_black = request.user
             match.status = 'LIVE'
             match.save()
+            publish_lobby('started', match)
             
             return JsonResponse({
                 'success': True,
@@ -105,6 +140,7 @@ def join_match(request, match_id):
             match.player_white = request.user
             match.status = 'LIVE'
             match.save()
+            publish_lobby('started', match)
             
             return JsonResponse({
                 'success': True,
@@ -126,7 +162,16 @@ def join_match(request, match_id):
 @require_http_methods(["GET"])
 def match_state(request, match_id):
     try:
-        match = get_object_or_404(Match, id=match_id)
+        match = get_object_or_404(
+            Match.objects.select_related('player_white', 'player_black'),
+            id=match_id
+        )
+        
+        game = games.get(match_id)
+        if game is not None:
+            current_fen, move_history = game.fen, list(game.history)
+        else:
+            current_fen, move_history = match.current_fen, match.move_history
         
         return JsonResponse({
             'success': True,
@@ -134,12 +179,12 @@ def match_state(request, match_id):
                 'id': match.id,
                 'status': match.status,
                 'result': match.result,
-                'current_fen': match.current_fen,
-                'move_history': match.move_history,
+                'current_fen': current_fen,
+                'move_history': move_history,
                 'player_white': match.player_white.username if match.player_white else None,
                 'player_black': match.player_black.username if match.player_black else None,
-                'white_connected': match.white_connected,
-                'black_connected': match.black_connected,
+                'white_connected': presence.is_connected(match_id, 'white'),
+                'black_connected': presence.is_connected(match_id, 'black'),
             }
         })
         
@@ -157,6 +202,7 @@ def leave_match(request, match_id):
         
         
         if match.status == 'WAIT' and match.player_white == request.user:
+            publish_lobby('removed', match)
             match.delete()
             return JsonResponse({
                 'success': True,
@@ -164,17 +210,20 @@ def leave_match(request, match_id):
             })
         
         
-        if match.status == 'LIVE':
-            if match.player_white == request.user:
-                match.result = '0-1'
-                match.status = 'END'
-                match.end_time = timezone.now()
-                match.save()
-            elif match.player_black == request.user:
-                match.result = '1-0'
-                match.status = 'END'
-                match.end_time = timezone.now()
-                match.save()
+        if match.status == 'LIVE' and request.user.id in (match.player_white_id, match.player_black_id):
+            result = '0-1' if match.player_white_id == request.user.id else '1-0'
+            # Conditional, so a game the consumer already ended (and rated)
+            # is not overwritten with a second result.
+            updated = Match.objects.filter(id=match.id, status='LIVE').update(
+                result=result,
+                status='END',
+                end_time=timezone.now(),
+            )
+            if updated:
+                match = Match.objects.select_related('player_white', 'player_black').get(id=match.id)
+                match.compact()
+                publish_lobby('ended', match)
+                match_ended.send(sender=Match, match=match)
         
         return JsonResponse({
             'success': True,
@@ -188,24 +237,70 @@ def leave_match(request, match_id):
         }, status=400)
 
 @require_http_methods(["GET"])
+@query_budget(2)
 def lobby_data(request):
     try:
-        waiting_matches = Match.objects.filter(status='WAIT').values(
-            'id', 'player_white__username', 'start_time'
-        ).order_by('-start_time')
+        waiting_matches, waiting_next = keyset_page(
+            Match.objects.filter(status='WAIT').values(
+                'id', 'player_white__username', 'start_time'
+            ),
+            'start_time', request.GET.get('waiting_before'), WAITING_LIMIT,
+        )
         
-        live_matches = Match.objects.filter(status='LIVE').values(
-            'id', 'player_white__username', 'player_black__username', 'start_time'
-        ).order_by('-start_time')[:10]
+        live_matches, live_next = keyset_page(
+            Match.objects.filter(status='LIVE').values(
+                'id', 'player_white__username', 'player_black__username', 'start_time'
+            ),
+            'start_time', request.GET.get('live_before'), LIVE_LIMIT,
+        )
         
         return JsonResponse({
             'success': True,
-            'waiting_matches': list(waiting_matches),
-            'live_matches': list(live_matches),
+            'waiting_matches': waiting_matches,
+            'live_matches': live_matches,
+            'waiting_next': waiting_next,
+            'live_next': live_next,
         })
         
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=400)
\ No newline at end of file
+        }, status=400)
+
+@login_required
+@require_http_methods(["GET"])
+def export_pgn(request):
+    status = request.GET.get('status')
+    tournament = request.GET.get('tournament')
+    try:
+        since = parse_day(request.GET.get('since'))
+        until = parse_day(request.GET.get('until'))
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Dates must be YYYY-MM-DD'
+        }, status=400)
+    if status and status not in dict(Match.STATUS_CHOICES):
+        return JsonResponse({
+            'success': False,
+            'error': 'Unknown status'
+        }, status=400)
+    if tournament and not tournament.isdigit():
+        return JsonResponse({
+            'success': False,
+            'error': 'Tournament must be an id'
+        }, status=400)
+    
+    matches = filter_matches(
+        player=request.GET.get('player'),
+        status=status,
+        since=since,
+        until=until,
+        tournament=tournament,
+    )
+    # Under ASGI a synchronous iterator would be buffered whole.
+    content = aiter_pgn(matches) if isinstance(request, ASGIRequest) else iter_pgn(matches)
+    response = StreamingHttpResponse(content, content_type='application/x-chess-pgn')
+    response['Content-Disposition'] = 'attachment; filename="matches.pgn"'
+    return response
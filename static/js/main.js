@@ -285,7 +285,31 @@ document.addEventListener('DOMContentLoaded', function() {
 
   //   resultsCount.textContent = `${data.profiles.length} members found`;
   // }
-  async function loadProfiles() {
+  const PROFILE_SEARCH_DELAY = 250;
+  let profileTimer = null;
+  let profileRequest = null;
+  let profileCursor = null;
+  let profileCount = 0;
+
+  function escapeProfileHtml(value) {
+    const div = document.createElement("div");
+    div.textContent = value == null ? "" : String(value);
+    return div.innerHTML;
+  }
+
+  function showRatingFacets(facets) {
+    if (!ratingFilter || !facets) return;
+    Array.from(ratingFilter.options).forEach(option => {
+      if (!option.dataset.label) option.dataset.label = option.textContent;
+      const count = facets[option.value];
+      option.textContent = count === undefined
+        ? option.dataset.label
+        : `${option.dataset.label} (${count})`;
+    });
+  }
+
+  // Fetches one page; with ``more`` it appends the next page to the list.
+  async function loadProfiles(more = false) {
     const container = document.getElementById("profile-results");
     const searchEl = document.getElementById("profile-search");
     const ratingEl = document.getElementById("rating-filter");
@@ -296,34 +320,75 @@ document.addEventListener('DOMContentLoaded', function() {
     const rating = ratingEl.value;
     const counter = document.getElementById("results-count");
 
+    if (profileRequest) profileRequest.abort();
+    profileRequest = null;
+
     if (search === "") {
       container.innerHTML = "";
+      profileCursor = null;
       if (counter) counter.textContent = "Start typing to search...";
       return;
     }
 
     const params = new URLSearchParams({ search, rating });
-    const response = await fetch(`/api/profiles/?${params.toString()}`);
-    const data = await response.json();
+    if (more && profileCursor) params.set("cursor", profileCursor);
+
+    const request = new AbortController();
+    profileRequest = request;
+    let data;
+    try {
+      const response = await fetch(`/api/profiles/?${params.toString()}`, { signal: request.signal });
+      if (!response.ok) return;
+      data = await response.json();
+    } catch (err) {
+      if (err.name !== "AbortError") console.error("Profile search failed", err);
+      return;
+    } finally {
+      if (profileRequest === request) profileRequest = null;
+    }
 
-    container.innerHTML = "";
-    data.profiles.forEach(profile => {
-      container.innerHTML += `
+    if (!more) {
+      container.innerHTML = "";
+      profileCount = 0;
+    }
+    const oldButton = container.querySelector(".load-more-profiles");
+    if (oldButton) oldButton.remove();
+
+    container.insertAdjacentHTML("beforeend", data.profiles.map(profile => `
         <div class="profile-card">
-          <div class="profile-name"><a href="${profile.profile_url}">${profile.name}</a></div>
+          <div class="profile-name"><a href="${escapeProfileHtml(profile.profile_url)}">${escapeProfileHtml(profile.name)}</a></div>
           <div class="profile-rating">Rating: ${profile.rating}</div>
-          <div class="profile-rank">Rank: ${profile.rank}</div>
-        </div>`;
-    });
+          <div class="profile-rank">Rank: ${profile.rank ?? "-"}</div>
+        </div>`).join(""));
+    profileCount += data.profiles.length;
+
+    profileCursor = data.next;
+    if (profileCursor) {
+      container.insertAdjacentHTML("beforeend",
+        '<button type="button" class="btn btn-secondary btn-small load-more-profiles">Load more</button>');
+    }
 
-    if (counter) counter.textContent = `${data.profiles.length} members found`;
+    showRatingFacets(data.facets);
+    if (counter) counter.textContent = `Showing ${profileCount} of ${data.total} members`;
+  }
+
+  // Wait for a pause in typing, so a search is one request, not one per key.
+  function scheduleProfiles() {
+    clearTimeout(profileTimer);
+    profileTimer = setTimeout(() => loadProfiles(), PROFILE_SEARCH_DELAY);
   }
 
   loadProfiles();
 
   if(searchInput && ratingFilter){
-    searchInput.addEventListener("input", () => loadProfiles());
-    ratingFilter.addEventListener("change", () => loadProfiles());
+    searchInput.addEventListener("input", scheduleProfiles);
+    ratingFilter.addEventListener("change", () => {
+      clearTimeout(profileTimer);
+      loadProfiles();
+    });
+    resultsContainer.addEventListener("click", e => {
+      if (e.target.closest(".load-more-profiles")) loadProfiles(true);
+    });
   }
   // Initialize theme manager
   const themeManager = new ThemeManager();
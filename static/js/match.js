@@ -8,6 +8,13 @@ class ChessMatch {
     this.selectedSquare = null;
     this.isFlipped = playerColor === 'black';
     this.moveHistory = [];
+    this.ply = 0;
+    this.hasState = false;
+    this.heartbeatTimer = null;
+    this.clock = null;
+    this.clockReceivedAt = 0;
+    this.clockTimer = null;
+    this.legalMoves = null;  // {from: [to, ...]} sent by the server for the current position
     this.websocket = null;
     this.isConnected = false;
     this.opponentConnected = false;
@@ -29,7 +36,12 @@ class ChessMatch {
   connectWebSocket() {
     // Construct WebSocket URL
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws/match/${this.matchId}/`;
+    let wsUrl = `${protocol}//${window.location.host}/ws/match/${this.matchId}/`;
+    
+    // After the first game state, reconnects only ask for missed moves
+    if (this.hasState) {
+      wsUrl += `?since=${this.ply}`;
+    }
     
     console.log('Connecting to WebSocket:', wsUrl);
     
@@ -41,7 +53,7 @@ class ChessMatch {
         this.isConnected = true;
         this.reconnectAttempts = 0;
         this.updateConnectionStatus();
-        this.requestGameState();
+        this.startHeartbeat();
       };
       
       this.websocket.onmessage = (e) => {
@@ -57,6 +69,7 @@ class ChessMatch {
       this.websocket.onclose = (e) => {
         console.log('WebSocket closed:', e.code, e.reason);
         this.isConnected = false;
+        this.stopHeartbeat();
         this.updateConnectionStatus();
         
         // Attempt reconnection
@@ -75,6 +88,24 @@ class ChessMatch {
     }
   }
 
+  startHeartbeat() {
+    // Keeps our presence entry alive on the server
+    this.stopHeartbeat();
+    if (this.playerColor === 'spectator') return;
+    this.heartbeatTimer = setInterval(() => {
+      if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
+        this.websocket.send(JSON.stringify({ type: 'heartbeat' }));
+      }
+    }, 10000);
+  }
+
+  stopHeartbeat() {
+    if (this.heartbeatTimer) {
+      clearInterval(this.heartbeatTimer);
+      this.heartbeatTimer = null;
+    }
+  }
+
   handleWebSocketMessage(event) {
     try {
       const data = JSON.parse(event.data);
@@ -84,6 +115,9 @@ class ChessMatch {
         case 'game_state':
           this.handleGameState(data);
           break;
+        case 'sync':
+          this.handleSync(data);
+          break;
         case 'move':
           this.handleOpponentMove(data);
           break;
@@ -121,6 +155,10 @@ class ChessMatch {
     // Load complete game state
     this.game.load(data.fen);
     this.moveHistory = data.move_history || [];
+    this.ply = data.ply || this.moveHistory.length;
+    this.hasState = true;
+    this.legalMoves = data.legal_moves || null;
+    this.updateClock(data.clock);
     
     // Update opponent connection status
     if (this.playerColor === 'white') {
@@ -138,7 +176,50 @@ class ChessMatch {
     console.log('Game state loaded:', data);
   }
 
+  handleSync(data) {
+    // Apply only the moves made since the ply we last saw
+    if (this.pendingMove) {
+      this.game.undo();
+      this.pendingMove = null;
+    }
+    
+    if (data.since !== this.ply) {
+      this.requestGameState();
+      return;
+    }
+    
+    for (const entry of data.moves) {
+      const move = this.game.move({
+        from: entry.uci.slice(0, 2),
+        to: entry.uci.slice(2, 4),
+        promotion: entry.uci[4] || 'q'
+      });
+      if (!move) {
+        console.error('Failed to apply synced move:', entry);
+        this.requestGameState();
+        return;
+      }
+      this.moveHistory.push(entry);
+    }
+    
+    this.ply = data.ply;
+    this.legalMoves = data.legal_moves || null;
+    this.selectedSquare = null;
+    this.updateDisplay();
+    this.updateClock(data.clock);
+    
+    if (data.game_over) {
+      this.showNotification(`Game over: ${data.result}`);
+    }
+  }
+
   handleOpponentMove(data) {
+    if (data.ply) {
+      this.ply = data.ply;
+    }
+    this.legalMoves = data.legal_moves || null;
+    this.updateClock(data.clock);
+    
     // ADDED: Check if this is our own move echo (prevents double-move bug)
     if (this.pendingMove && 
         this.pendingMove.from === data.move.from && 
@@ -220,6 +301,10 @@ class ChessMatch {
 
   handleGameEnd(data) {
     console.log('Game ended:', data);
+    this.legalMoves = {};
+    if (this.clock) {
+      this.updateClock(data.clock || { ...this.clock, running: null });
+    }
     setTimeout(() => {
       this.showGameOverModal({
         game_over: true,
@@ -229,6 +314,42 @@ class ChessMatch {
     }, 500);
   }
 
+  updateClock(clock) {
+    // Server clock snapshot; the running side is counted down locally
+    if (!clock) return;
+    this.clock = clock;
+    this.clockReceivedAt = performance.now();
+    this.renderClocks();
+    if (!this.clockTimer) {
+      this.clockTimer = setInterval(() => this.renderClocks(), 250);
+    }
+  }
+
+  renderClocks() {
+    if (!this.clock) return;
+    const elapsed = performance.now() - this.clockReceivedAt;
+    
+    ['white', 'black'].forEach(color => {
+      const element = document.getElementById(`${color}-clock`);
+      if (!element) return;
+      
+      let ms = this.clock[color];
+      if (this.clock.running === color) {
+        ms = Math.max(0, ms - elapsed);
+      }
+      element.textContent = this.formatClock(ms);
+      element.classList.toggle('running', this.clock.running === color);
+      element.classList.toggle('low', ms < 20000);
+    });
+  }
+
+  formatClock(ms) {
+    const total = Math.ceil(ms / 1000);
+    const minutes = Math.floor(total / 60);
+    const seconds = total % 60;
+    return `${minutes}:${String(seconds).padStart(2, '0')}`;
+  }
+
   sendMessage(message) {
     if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
       this.websocket.send(JSON.stringify(message));
@@ -239,6 +360,7 @@ class ChessMatch {
   }
 
   requestGameState() {
+    // Without a ply the server replies with a full snapshot
     this.sendMessage({ type: 'request_sync' });
   }
 
@@ -273,6 +395,7 @@ class ChessMatch {
 
   updateBoard() {
     const squares = document.querySelectorAll('.square');
+    const targets = this.selectedSquare ? this.legalTargets(this.selectedSquare) : [];
     
     squares.forEach(square => {
       const squareName = square.dataset.square;
@@ -295,11 +418,8 @@ class ChessMatch {
         square.classList.add('selected');
       }
       
-      if (this.selectedSquare) {
-        const moves = this.game.moves({ square: this.selectedSquare, verbose: true });
-        if (moves.some(move => move.to === squareName)) {
-          square.classList.add('legal-move');
-        }
+      if (targets.includes(squareName)) {
+        square.classList.add('legal-move');
       }
       
       const history = this.game.history({ verbose: true });
@@ -319,6 +439,14 @@ class ChessMatch {
     });
   }
 
+  legalTargets(from) {
+    // Prefer the server's map; fall back to chess.js before the first state
+    if (this.legalMoves) {
+      return this.legalMoves[from] || [];
+    }
+    return this.game.moves({ square: from, verbose: true }).map(move => move.to);
+  }
+
   findKingSquare(color) {
     const board = this.game.board();
     for (let rank = 0; rank < 8; rank++) {
@@ -379,6 +507,14 @@ class ChessMatch {
   }
 
   attemptMove(from, to) {
+    if (!this.legalTargets(from).includes(to)) {
+      // Rejected locally; the server never sees illegal moves
+      this.selectedSquare = null;
+      this.updateDisplay();
+      this.showNotification('Invalid move');
+      return;
+    }
+    
     const piece = this.game.get(from);
     const isPromotion = piece && piece.type === 'p' && 
                        ((piece.color === 'w' && to[1] === '8') || 
@@ -411,7 +547,8 @@ class ChessMatch {
         type: 'move',
         from: from,
         to: to,
-        promotion: promotion
+        promotion: promotion,
+        ply: this.ply
       });
       
       this.selectedSquare = null;
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('match', '0010_match_rated'),
+        ('tournaments', '0007_remove_tournamentmatch_fen_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tournamentmatch',
+            index=models.Index(fields=['player1', 'scheduled_at'], name='tmatch_player1_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournamentmatch',
+            index=models.Index(fields=['player2', 'scheduled_at'], name='tmatch_player2_time_idx'),
+        ),
+    ]
@@ -41,7 +41,12 @@ class Tournament(models.Model):
             "increment_seconds": self.increment_seconds,
         }
         if include_matches:
-            data["matches"] = [match.to_dict() for match in self.matches.all()]
+            matches = (
+                self.matches
+                .select_related("player1__profile", "player2__profile")
+                .annotate(fen=models.F("live_match__current_fen"))
+            )
+            data["matches"] = [match.to_dict() for match in matches]
         return data
     
     class Meta:
@@ -87,26 +92,44 @@ class TournamentMatch(models.Model):
         related_name="tournament_pairing"
     )
 
+    # Result as last read from the database; None if unknown.
+    _loaded_result = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_result = instance.__dict__.get("result")
+        return instance
+
     def __str__(self):
         return f"{self.tournament.name}: {self.player1.username} vs {self.player2.username}"
 
     def to_dict(self):
+        # Lists annotate ``fen`` (live_match__current_fen) rather than load each live game.
+        fen = getattr(self, "fen", None)
+        if fen is None and self.live_match_id is not None:
+            fen = self.live_match.current_fen
         return {
             "id": self.id,
-            "tournament_id": self.tournament.id,
+            "tournament_id": self.tournament_id,
             "tournament_name": self.tournament.name,
             "player1": self.player1.to_dict(),
             "player2": self.player2.to_dict(),
             "scheduled_at": self.scheduled_at.isoformat(),
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
-            "live_match_id": self.live_match.id if self.live_match else None,
+            "live_match_id": self.live_match_id,
             "result": self.result,
             "match_created": self.match_created,
-            "fen": self.fen,
+            "fen": fen,
         }
     
     class Meta:
         ordering = ['-scheduled_at']
+        indexes = [
+            # A player's games, newest first, for their match history.
+            models.Index(fields=['player1', 'scheduled_at'], name='tmatch_player1_time_idx'),
+            models.Index(fields=['player2', 'scheduled_at'], name='tmatch_player2_time_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['tournament', 'player1', 'player2'],
@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from tournaments.models import TournamentMatch
+from match.lobby import publish as publish_lobby
 from match.models import Match
 
 
@@ -16,8 +17,11 @@ def create_match_when_scheduled(sender, instance, created, **kwargs):
         player_white=instance.player1,
         player_black=instance.player2,
         scheduled_start=instance.scheduled_at,
+        base_seconds=instance.tournament.base_minutes * 60,
+        increment_seconds=instance.tournament.increment_seconds,
         status="WAIT"
     )
+    publish_lobby('created', live_match)
 
     instance.live_match = live_match
     instance.save(update_fields=["live_match"])
@@ -0,0 +1,44 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+
+from .models import Tournament, TournamentMatch
+
+
+class ScheduleMatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create(username='manager', is_superuser=True)
+        tournament = Tournament.objects.create(name='Open')
+        cls.pairing = TournamentMatch.objects.create(
+            tournament=tournament,
+            player1=User.objects.create(username='p1'),
+            player2=User.objects.create(username='p2'),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def test_rejects_bad_time_control(self):
+        url = reverse('schedule_match', args=[self.pairing.id])
+        for data in ({'minutes': 'ten'}, {'increment': '2s'}, {'minutes': '0'}, {'increment': '-1'}):
+            with self.subTest(data=data):
+                response = self.client.post(url, {'datetime': '2030-01-01T10:00', **data})
+                self.assertEqual(response.status_code, 400)
+        self.pairing.refresh_from_db()
+        self.assertNotEqual(self.pairing.scheduled_at.year, 2030)
+
+
+class TournamentSerializationTests(TestCase):
+    def test_matches_serialize_in_one_query(self):
+        tournament = Tournament.objects.create(name='Swiss')
+        players = [User.objects.create(username=f'entrant{i}') for i in range(8)]
+        for white, black in zip(players[::2], players[1::2]):
+            TournamentMatch.objects.create(tournament=tournament, player1=white, player2=black)
+        self.assertTrue(TournamentMatch.objects.filter(tournament=tournament, live_match__isnull=False).exists())
+        tournament = Tournament.objects.get(pk=tournament.pk)
+        with self.assertNumQueries(1):
+            data = tournament.to_dict(include_matches=True)
+        self.assertEqual(len(data['matches']), 4)
+        self.assertTrue(all(match['fen'] for match in data['matches']))
@@ -1,6 +1,8 @@
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required, user_passes_test
 from .models import Tournament, TournamentRegistration, TournamentMatch
+from match.models import Match
 from .services import generate_pairings
 from django.utils.timezone import now
 from django.views.decorators.http import require_POST
@@ -79,14 +81,40 @@ def tournaments(request):
 def schedule_match(request, match_id):
     match = get_object_or_404(TournamentMatch, id=match_id)
 
+    live_match = match.live_match
+    if live_match and live_match.base_seconds:
+        minutes = live_match.base_seconds // 60
+        increment = live_match.increment_seconds
+    else:
+        minutes = match.tournament.base_minutes
+        increment = match.tournament.increment_seconds
+
     if request.method == "POST":
+        try:
+            minutes = int(request.POST.get("minutes") or minutes)
+            increment = int(request.POST.get("increment") or increment)
+        except ValueError:
+            return HttpResponseBadRequest("Minutes and increment must be whole numbers.")
+        if minutes < 1 or increment < 0:
+            return HttpResponseBadRequest("Invalid time control.")
+
         match.scheduled_at = request.POST.get("datetime")
-        match.time_minutes = request.POST.get("minutes")
-        match.increment_seconds = request.POST.get("increment")
         match.save()
 
+        if live_match and live_match.status == 'WAIT':
+            Match.objects.filter(id=live_match.id).update(
+                scheduled_start=match.scheduled_at,
+                base_seconds=minutes * 60,
+                increment_seconds=increment,
+                white_clock_ms=None,
+                black_clock_ms=None,
+                clock_started_at=None,
+            )
+
         return redirect('tournament_detail', match.tournament.id)
 
     return render(request, "schedule-match.html", {
-        "match": match
+        "match": match,
+        "minutes": minutes,
+        "increment": increment,
     })
\ No newline at end of file